@@ -0,0 +1,87 @@
+"""
+Cold storage for resolved items.
+
+Once an item has been resolved for ``settings.ITEM_ARCHIVE_AFTER_DAYS`` it
+moves from ``Item`` to ``ArchivedItem``, a table with the same columns, so the
+hot table (and every feed query on it) only holds signals still in play.
+``archive_resolved`` walks the candidates in primary-key chunks, each moved in
+its own short transaction:
+
+* the rows are copied into ``ArchivedItem`` under their original pk;
+* their conversations are repointed from ``item`` to ``archived_item`` in one
+  UPDATE, so chat history and the inbox survive the move;
+* the ``Item`` rows are deleted. Their finished claims and match records go
+  with them; who claimed the item and when stays on the archived copy;
+* the copies are re-added to the search index the delete just dropped them
+  from, keeping them searchable under the resolved filter.
+
+Readers find archived items through the resolved feed in ``home`` and the
+``ArchivedItem`` fallback in ``item_detail``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ArchivedItem, Conversation, Item
+from .search import get_search_backend
+
+FIELDS = tuple(field.attname for field in Item._meta.concrete_fields)
+
+
+def archivable(days=None, now=None):
+    """Resolved items closed for more than ``days`` (default ``ITEM_ARCHIVE_AFTER_DAYS``)."""
+    now = now or timezone.now()
+    if days is None:
+        days = getattr(settings, 'ITEM_ARCHIVE_AFTER_DAYS', 90)
+    cutoff = now - timedelta(days=days)
+    # Items resolved before resolved_at existed fall back to their last edit
+    return Item.objects.filter(
+        Q(resolved_at__lt=cutoff) | Q(resolved_at__isnull=True, updated_at__lt=cutoff),
+        status=Item.STATUS_RESOLVED,
+    )
+
+
+def archive_resolved(days=None, batch_size=500, now=None, dry_run=False):
+    """Moves archivable items into ``ArchivedItem`` chunk by chunk; returns how many."""
+    now = now or timezone.now()
+    candidates = archivable(days, now)
+    total = 0
+    after = 0
+    while True:
+        ids = list(candidates.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        after = ids[-1]
+        if dry_run:
+            total += len(ids)
+            continue
+        total += move(candidates.filter(pk__in=ids), now)
+
+
+def move(items, now=None, archived_at=None):
+    """
+    Archives ``items`` in one transaction; returns how many moved. Copies are
+    stamped ``now`` unless ``archived_at`` (item id -> time, for an import
+    restoring earlier archive runs) says otherwise.
+    """
+    now = now or timezone.now()
+    archived_at = archived_at or {}
+    with transaction.atomic():
+        # Re-read under lock: an item reopened since the scan stays where it is
+        rows = list(items.select_for_update().values(*FIELDS))
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        archived = ArchivedItem.objects.bulk_create(
+            [ArchivedItem(**row, archived_at=archived_at.get(row['id'], now)) for row in rows], ignore_conflicts=True
+        )
+        # Both columns are assigned from the pre-update row, so one UPDATE swaps the reference
+        Conversation.objects.filter(item_id__in=ids).update(archived_item_id=F('item_id'), item=None)
+        Item.objects.filter(pk__in=ids).delete()
+        backend = get_search_backend()
+        for item in archived:
+            backend.index(item)
+    return len(rows)
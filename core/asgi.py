@@ -0,0 +1,43 @@
+"""
+ASGI entry point that keeps the sync thread count fixed.
+
+Django's ``ASGIHandler`` gives every request its own thread-sensitive context,
+and with it a dedicated worker thread for ORM calls and sync code. That thread
+lives until the request ends, so a thousand idle long polls or chat tabs mean
+a thousand parked threads. ``PooledASGIHandler`` hands each request one of
+``ASGI_SYNC_THREADS`` shared contexts instead, picking the least loaded, so idle
+clients wait on the event loop and only actual sync work occupies a thread.
+
+Requests sharing a thread share its database connection. That is safe because
+every sync call runs to completion before another starts, and no transaction
+spans two of them. Every middleware has to be async-capable: a sync one would
+hold the shared thread for the whole async view it wraps.
+"""
+import django
+from asgiref.sync import SyncToAsync, ThreadSensitiveContext
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+
+
+class PooledASGIHandler(ASGIHandler):
+    def __init__(self, threads):
+        super().__init__()
+        # Kept alive (and never exited) so their executors, one thread each, are reused
+        self._load = {ThreadSensitiveContext(): 0 for _ in range(threads)}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await super().__call__(scope, receive, send)
+        context = min(self._load, key=self._load.get)
+        self._load[context] += 1
+        token = SyncToAsync.thread_sensitive_context.set(context)
+        try:
+            await self.handle(scope, receive, send)
+        finally:
+            SyncToAsync.thread_sensitive_context.reset(token)
+            self._load[context] -= 1
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return PooledASGIHandler(getattr(settings, 'ASGI_SYNC_THREADS', 4))
@@ -0,0 +1,233 @@
+"""
+In-process benchmark harness for the hot views.
+
+Each scenario is a named URL hit repeatedly through Django's test client (or
+``AsyncClient`` for the ASGI path) as a chosen user, with every request
+wrapped in ``record_queries()``. Results carry p50/p95/p99 latency and the
+query counts per scenario, and are written as JSON so two runs, say before
+and after a change, can be compared with ``compare``.
+"""
+import asyncio
+import json
+import platform
+import statistics
+import threading
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.test import AsyncClient, Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .instrumentation import percentile, record_queries
+from .models import Conversation, Item
+
+
+def default_scenarios(user):
+    """The key pages; the chat scenario opens ``user``'s busiest conversation."""
+    conversation = (
+        Conversation.objects.involving(user)
+        .annotate(size=Count('messages')).order_by('-size').values_list('pk', flat=True).first()
+    )
+    item = Item.objects.order_by('-created_at').values_list('pk', flat=True).first()
+    home = reverse('core:home')
+    scenarios = {
+        'home': home,
+        'home_search': f'{home}?q=wallet',
+        'home_filters': f'{home}?item_type_filter=LOST&status_filter=ALL',
+        'home_resolved': f'{home}?status_filter=resolved',
+        'inbox': reverse('core:inbox'),
+        'dashboard': reverse('core:dashboard'),
+        'check_notifications': reverse('core:check_notifications'),
+    }
+    if conversation:
+        scenarios['conversation_detail'] = reverse('core:conversation_detail', args=[conversation])
+    if item:
+        scenarios['item_detail'] = reverse('core:item_detail', args=[item])
+    return scenarios
+
+
+def _summarize(durations, queries, statuses, wall_time=None):
+    ordered = sorted(durations)
+    return {
+        'requests': len(durations),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'queries': {'min': min(queries), 'max': max(queries), 'mean': round(statistics.fmean(queries), 2)} if queries else None,
+        'statuses': sorted(set(statuses)),
+        'throughput_rps': round(len(durations) / (wall_time or sum(durations)), 1),
+    }
+
+
+def _client_defaults():
+    host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost').lstrip('.')
+    return {'HTTP_HOST': host}
+
+
+def _drive(url, user, requests, warmup, ready=None):
+    client = Client(**_client_defaults())
+    if user is not None:
+        client.force_login(user)
+    for _ in range(warmup):
+        client.get(url)
+    if ready is not None:
+        ready.wait()
+    durations, queries, statuses = [], [], []
+    for _ in range(requests):
+        with record_queries() as recorder:
+            started = time.perf_counter()
+            response = client.get(url)
+            durations.append(time.perf_counter() - started)
+        queries.append(recorder.query_count)
+        statuses.append(response.status_code)
+    return durations, queries, statuses
+
+
+def run_sync(url, user, requests, warmup, concurrency=1):
+    """
+    With ``concurrency`` > 1 the requests are split across that many threads,
+    each with its own client and database connection, and throughput is
+    measured against wall-clock time: that is where connection reuse and
+    SQLite's journal mode show.
+    """
+    if concurrency <= 1:
+        return _summarize(*_drive(url, user, requests, warmup))
+    ready = threading.Barrier(concurrency + 1)
+    results = []
+
+    def worker(share):
+        try:
+            results.append(_drive(url, user, share, warmup, ready))
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(requests // concurrency + (index < requests % concurrency),))
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    durations, queries, statuses = ([value for result in results for value in result[part]] for part in range(3))
+    return _summarize(durations, queries, statuses, wall_time)
+
+
+def run_async(url, user, requests, warmup):
+    async def drive():
+        client = AsyncClient(**_client_defaults())
+        if user is not None:
+            await client.aforce_login(user)
+        for _ in range(warmup):
+            await client.get(url)
+        durations, statuses = [], []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get(url)
+            durations.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+        return durations, statuses
+
+    # Queries run on sync_to_async worker threads, out of the recorder's reach,
+    # so the ASGI path reports latency only.
+    durations, statuses = asyncio.run(drive())
+    return _summarize(durations, None, statuses)
+
+
+def run(scenarios, user, requests=50, warmup=5, use_asgi=False, label='', concurrency=1):
+    results = {}
+    for name, url in scenarios.items():
+        if use_asgi:
+            results[name] = dict(url=url, **run_async(url, user, requests, warmup))
+        else:
+            results[name] = dict(url=url, **run_sync(url, user, requests, warmup, concurrency))
+    return {
+        'label': label,
+        'started_at': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'settings': settings.SETTINGS_MODULE,
+            'database': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'debug': settings.DEBUG,
+            'client': 'asgi' if use_asgi else 'wsgi',
+            'concurrency': 1 if use_asgi else concurrency,
+            'user': getattr(user, 'username', None),
+            'requests': requests,
+            'warmup': warmup,
+        },
+        'scenarios': results,
+    }
+
+
+def run_fragments(per_page=50, rounds=30):
+    """
+    Renders one feed page of ``per_page`` item cards with the fragment cache
+    cleared before every render (cold) and then primed (warm). Only template
+    work is timed: the items are loaded once up front.
+    """
+    items = list(Item.objects.select_related('user', 'user__profile').order_by('-created_at', '-id')[:per_page])
+    request = RequestFactory().get(reverse('core:home'), **_client_defaults())
+    request.user = AnonymousUser()
+    context = {'items': items, 'next_page_url': None, 'near_me': None}
+    fragments = caches['template_fragments'] if 'template_fragments' in settings.CACHES else caches['default']
+
+    def timed(prepare):
+        durations = []
+        for _ in range(rounds):
+            prepare()
+            started = time.perf_counter()
+            render_to_string('partials/item_feed.html', context, request=request)
+            durations.append(time.perf_counter() - started)
+        return _summarize(durations, None, [200])
+
+    cold = timed(fragments.clear)
+    render_to_string('partials/item_feed.html', context, request=request)
+    warm = timed(lambda: None)
+    return {
+        'items': len(items),
+        'rounds': rounds,
+        'cold': cold,
+        'warm': warm,
+        'speedup': round(cold['p50_ms'] / warm['p50_ms'], 1) if warm['p50_ms'] else None,
+    }
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def compare(baseline, current):
+    """
+    Per-scenario ``(name, baseline p95, current p95, change %, baseline rps,
+    current rps)`` rows for scenarios in both runs.
+    """
+    rows = []
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        rows.append((
+            name, before['p95_ms'], result['p95_ms'], round(change, 1), before['throughput_rps'], result['throughput_rps'],
+        ))
+    return rows
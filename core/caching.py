@@ -0,0 +1,116 @@
+"""
+Response cache for public pages seen by anonymous visitors.
+
+``cache_anonymous_page(normalize)`` wraps a view. ``normalize(request)``
+reduces the query string to the tuple of values that actually change the
+page, or returns ``None`` when the request should not be cached. Keys embed
+a generation number, and ``Item`` signals bump it on every save or delete.
+Invalidation is O(1): stale entries are never looked up again and expire on
+their own.
+
+Concurrent misses on the same key are collapsed: the first request takes a
+short-lived lock with ``cache.add`` and renders the page. The others never
+wait for it, since a sleeping request would pin one of the few threads the
+ASGI pool shares. They serve the last copy rendered for the same parameters
+(any generation, marked ``STALE``), and render the page themselves only when
+there is none, such as on a cold cache. Everything goes through Django's cache
+API, so any backend works (locmem, file, or a shared one such as Redis). The
+cross-process guarantees are those of the backend's ``add``.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+GENERATION_KEY = 'pagecache:generation'
+LOCK_TIMEOUT = 10       # seconds a renderer may hold the stampede lock
+STALE_TIMEOUT = 3600    # how long the last copy of a page stays servable during a render
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def generation():
+    cache = get_cache()
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        # Seeded from the clock so a restarted locmem cache never reuses old keys
+        cache.add(GENERATION_KEY, int(time.time()), timeout=None)
+        value = cache.get(GENERATION_KEY)
+    return value
+
+
+def bump_generation():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, int(time.time()), timeout=None)
+
+
+def _digest(params):
+    return hashlib.sha1(repr(params).encode()).hexdigest()
+
+
+def page_key(view_name, params):
+    return f'pagecache:{view_name}:{generation()}:{_digest(params)}'
+
+
+def stale_key(view_name, params):
+    """The last copy of a page, whatever generation it was rendered in."""
+    return f'pagecache:{view_name}:last:{_digest(params)}'
+
+
+def _cacheable(request):
+    # Flash messages are per visitor; a page showing them must not be shared
+    return not request.user.is_authenticated and request.method == 'GET' and not len(messages.get_messages(request))
+
+
+def _freeze(response):
+    return response.status_code, response['Content-Type'], response.content
+
+
+def _thaw(entry, state):
+    status, content_type, content = entry
+    response = HttpResponse(content, status=status, content_type=content_type)
+    response['X-Page-Cache'] = state
+    return response
+
+
+def cache_anonymous_page(normalize, timeout=None):
+    def decorate(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            params = normalize(request) if _cacheable(request) else None
+            if params is None:
+                return view(request, *args, **kwargs)
+            cache = get_cache()
+            key = page_key(view.__name__, params)
+            entry = cache.get(key)
+            if entry is not None:
+                return _thaw(entry, 'HIT')
+
+            lock = f'{key}:lock'
+            locked = cache.add(lock, 1, timeout=LOCK_TIMEOUT)
+            if not locked:
+                entry = cache.get(stale_key(view.__name__, params))
+                if entry is not None:
+                    return _thaw(entry, 'STALE')
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming and not response.cookies:
+                    entry = _freeze(response)
+                    cache.set(key, entry, timeout or getattr(settings, 'PAGE_CACHE_TIMEOUT', 60))
+                    cache.set(stale_key(view.__name__, params), entry, STALE_TIMEOUT)
+                    response['X-Page-Cache'] = 'MISS'
+                return response
+            finally:
+                if locked:
+                    cache.delete(lock)
+        return wrapper
+    return decorate
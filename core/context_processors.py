@@ -1,12 +1,13 @@
 # core/context_processors.py
-from .models import Message
+from .models import UnreadCounter
+from .realtime import holds_connections
 
 def unread_messages_count(request):
     if request.user.is_authenticated:
-        # Count messages not sent by the user that are still marked as unread
-        count = Message.objects.filter(
-            conversation__participants=request.user,
-            is_read=False
-        ).exclude(sender=request.user).count()
-        return {'unread_count': count}
-    return {'unread_count': 0}
\ No newline at end of file
+        # Denormalized counter: a single primary-key lookup instead of a COUNT join
+        return {'unread_count': UnreadCounter.get_count(request.user)}
+    return {'unread_count': 0}
+
+def live_notifications(request):
+    # base.html opens the SSE stream only where it doesn't pin a worker thread
+    return {'live_notifications': holds_connections(request)}
\ No newline at end of file
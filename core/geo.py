@@ -0,0 +1,93 @@
+"""
+Geohash helpers for "near me" radius queries.
+
+Every item with coordinates stores its geohash in an indexed column. A radius
+search picks the geohash precision whose cells are at least as large as the
+radius, so the circle always fits inside the centre cell plus its eight
+neighbours; those cells become plain B-tree range scans, and exact haversine
+distance is only ever computed for the rows inside them.
+"""
+import math
+
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+STORED_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude, longitude, precision=STORED_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell at ``precision``, in degrees."""
+    lat_bits = (5 * precision) // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together cover the circle around the point."""
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    precision = 1
+    for candidate in range(STORED_PRECISION, 0, -1):
+        height, width = cell_size(candidate)
+        if height * KM_PER_DEGREE >= radius_km and width * KM_PER_DEGREE * cos_lat >= radius_km:
+            precision = candidate
+            break
+    height, width = cell_size(precision)
+    cells = set()
+    for d_lat in (-1, 0, 1):
+        for d_lon in (-1, 0, 1):
+            lat = min(max(latitude + d_lat * height, -90.0), 90.0)
+            lon = (longitude + d_lon * width + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def within_cells(cells, field='geohash'):
+    """ORs one index range scan per cell: ``prefix <= geohash < prefix + '~'``."""
+    condition = Q()
+    for cell in cells:
+        condition |= Q(**{f'{field}__gte': cell, f'{field}__lt': cell + '~'})
+    return condition
+
+
+def distance_km(latitude, longitude, lat_field='latitude', lon_field='longitude'):
+    """Haversine distance from the point to each row, as an ORM expression."""
+    lat0 = math.radians(latitude)
+    row_lat = Radians(Cast(lat_field, FloatField()))
+    row_lon = Radians(Cast(lon_field, FloatField()))
+    half_dlat = (row_lat - Value(lat0)) / 2
+    half_dlon = (row_lon - Value(math.radians(longitude))) / 2
+    a = Power(Sin(half_dlat), 2) + Value(math.cos(lat0)) * Cos(row_lat) * Power(Sin(half_dlon), 2)
+    # Rounding can push sqrt(a) a hair past 1, outside asin's domain
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def near(queryset, latitude, longitude, radius_km):
+    """Rows within ``radius_km`` of the point, annotated with ``distance`` in km."""
+    return (
+        queryset.filter(within_cells(covering_cells(latitude, longitude, radius_km)))
+        .annotate(distance=distance_km(latitude, longitude))
+        .filter(distance__lte=radius_km)
+    )
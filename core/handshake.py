@@ -0,0 +1,86 @@
+"""
+Resolution handshake state machine.
+
+A claim (``ResolutionRequest``) moves an item ACTIVE -> PENDING when it is
+opened or first signed, and PENDING -> RESOLVED once both the reporter and the
+claimant have signed. Every transition is a conditional
+``UPDATE ... WHERE <expected state>`` inside one transaction, so two parties
+clicking at the same instant cannot both "win": the flag update only counts
+for the first signer, and exactly one request flips the item to RESOLVED and
+queues the completion notifications. No row is saved whole; each step writes
+only the columns it changes. Plain UPDATEs skip ``Item`` signals, so the
+transitions invalidate the anonymous page cache themselves.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists
+from django.utils import timezone
+
+from .caching import bump_generation
+from .models import Item, Notification, ResolutionRequest
+from .tasks import queue_notifications
+
+# Outcomes of ``sign``
+ALREADY_SIGNED = 'already_signed'
+ALREADY_RESOLVED = 'already_resolved'
+SIGNED = 'signed'
+RESOLVED = 'resolved'
+
+
+def open_claim(item, claimant):
+    """
+    Files ``claimant``'s claim on ``item`` and marks the item pending. The
+    owner is notified only by the request that actually created the claim.
+    Returns ``(claim, created)``.
+    """
+    try:
+        with transaction.atomic():
+            claim = ResolutionRequest.objects.create(item=item, claimant=claimant)
+            if Item.objects.filter(pk=item.pk, status=Item.STATUS_ACTIVE).update(
+                status=Item.STATUS_PENDING, updated_at=timezone.now()
+            ):
+                transaction.on_commit(bump_generation)
+            # Several claims on one item pile up in a single alert for its owner
+            queue_notifications([Notification(
+                user_id=item.user_id, kind=Notification.KIND_HANDSHAKE, source=f'item:{item.pk}',
+                text=f"NEW HANDSHAKE REQUEST: {item.title.upper()}.",
+            )])
+    except IntegrityError:
+        return ResolutionRequest.objects.get(item=item, claimant=claimant), False
+    return claim, True
+
+
+def sign(claim, as_claimant):
+    """
+    Records one party's signature on ``claim`` (its ``item`` should be
+    loaded) and resolves the item if that completes the handshake.
+    """
+    item = claim.item
+    if item.status == Item.STATUS_RESOLVED:
+        return ALREADY_RESOLVED
+    flag = 'claimant_confirmed' if as_claimant else 'reporter_confirmed'
+    now = timezone.now()
+    with transaction.atomic():
+        # Writing first also takes SQLite's write lock up front
+        if not ResolutionRequest.objects.filter(pk=claim.pk, **{flag: False}).update(**{flag: True, 'updated_at': now}):
+            return ALREADY_SIGNED
+        signed_by_both = ResolutionRequest.objects.filter(pk=claim.pk, claimant_confirmed=True, reporter_confirmed=True)
+        resolved = (
+            Item.objects.filter(pk=item.pk).exclude(status=Item.STATUS_RESOLVED).filter(Exists(signed_by_both))
+            .update(
+                status=Item.STATUS_RESOLVED, is_active=False, is_claimed=True,
+                claimed_by_id=claim.claimant_id, resolved_at=now, updated_at=now,
+            )
+        )
+        if resolved:
+            transaction.on_commit(bump_generation)
+            text = f"HANDSHAKE COMPLETE: {item.title.upper()} RESOLVED."
+            queue_notifications([
+                Notification(user_id=user_id, kind=Notification.KIND_HANDSHAKE, text=text)
+                for user_id in (item.user_id, claim.claimant_id)
+            ])
+            return RESOLVED
+        if item.status == Item.STATUS_ACTIVE and Item.objects.filter(pk=item.pk, status=Item.STATUS_ACTIVE).update(
+            status=Item.STATUS_PENDING, updated_at=now
+        ):
+            transaction.on_commit(bump_generation)
+    return SIGNED
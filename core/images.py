@@ -0,0 +1,142 @@
+"""
+Image derivative pipeline.
+
+Each uploaded image gets resized WebP (and AVIF, when Pillow was built with it)
+copies stored next to the original as ``<name>.<width>w.<format>``. Images
+narrower than a target width are not upscaled, but still get that file name,
+so templates can build ``srcset`` lists from names alone without asking storage
+what exists. EXIF/XMP is stripped from the derivatives and, when present, from
+the original too; camera rotation is baked into the pixels first, because
+browsers can no longer read it from EXIF. The cleaned original is written
+under a temporary name and swapped in, so it is never missing, and a JPEG
+that needs no rotation only loses its metadata segments, not quality.
+"""
+import os
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import ExifTags, Image, ImageOps, JpegImagePlugin, features
+
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+QUALITY = {'webp': 80, 'avif': 60}
+DERIVATIVE_RE = re.compile(r'\.\d+w\.(webp|avif)$')
+MEDIA_DIRS = ('item_images', 'profile_pics', 'chat_images')
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+
+
+def available_formats():
+    """Modern formats this Pillow build can encode, best compression first."""
+    return tuple(fmt for fmt in ('avif', 'webp') if features.check(fmt))
+
+
+def derivative_name(name, width, fmt):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{fmt}'
+
+
+def is_derivative(name):
+    return bool(DERIVATIVE_RE.search(name))
+
+
+def srcset(field_file, fmt):
+    """``url 320w, url 640w, ...`` for one format of ``field_file``'s derivatives."""
+    storage = field_file.storage
+    return ', '.join(
+        f'{storage.url(derivative_name(field_file.name, width, fmt))} {width}w' for width in DERIVATIVE_WIDTHS
+    )
+
+
+def thumbnail_url(field_file, width=DERIVATIVE_WIDTHS[0], fmt='webp'):
+    return field_file.storage.url(derivative_name(field_file.name, width, fmt))
+
+
+def has_derivatives(field_file):
+    formats = available_formats()
+    if not formats:
+        return True
+    return field_file.storage.exists(derivative_name(field_file.name, DERIVATIVE_WIDTHS[-1], formats[-1]))
+
+
+def strip_jpeg_segments(data):
+    """JPEG bytes without their APP1 (EXIF/XMP) segments; the compressed scan is copied as is."""
+    kept, pos = [data[:2]], 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:  # start of scan: everything after it is image data
+            break
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker != 0xE1:
+            kept.append(data[pos:end])
+        pos = end
+    kept.append(data[pos:])
+    return b''.join(kept)
+
+
+def _cleaned_original(original, upright, data):
+    """The original's bytes minus EXIF/XMP, re-encoded only when rotation has to be baked in."""
+    buffer = BytesIO()
+    if original.format != 'JPEG':
+        upright.save(buffer, format=original.format)
+    elif original.getexif().get(ExifTags.Base.Orientation, 1) == 1:
+        return strip_jpeg_segments(data)
+    else:
+        # Reusing the camera's quantization tables keeps the re-encode at its original quality
+        upright.save(
+            buffer, format='JPEG', qtables=original.quantization, subsampling=JpegImagePlugin.get_sampling(original),
+            icc_profile=original.info.get('icc_profile'),
+        )
+    return buffer.getvalue()
+
+
+def _swap_in(storage, name, content):
+    """Replaces ``name``'s contents without a moment where it is missing or lost."""
+    root, ext = os.path.splitext(name)
+    temp = storage.save(f'{root}.stripped{ext}', ContentFile(content))
+    try:
+        os.replace(storage.path(temp), storage.path(name))
+    except NotImplementedError:
+        # Remote storages can't rename; the clean copy is at least stored before the original goes
+        storage.delete(name)
+        with storage.open(temp, 'rb') as clean:
+            storage.save(name, clean)
+        storage.delete(temp)
+
+
+def generate_derivatives(storage, name, overwrite=False):
+    """Writes every width/format derivative of ``name``; returns the names written."""
+    targets = [derivative_name(name, width, fmt) for width in DERIVATIVE_WIDTHS for fmt in available_formats()]
+    if not overwrite and all(storage.exists(target) for target in targets):
+        return []
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+    original = Image.open(BytesIO(data))
+    original.load()
+    image = ImageOps.exif_transpose(original)
+    # Encoders copy EXIF/XMP from ``info`` by default; derivatives ship pixels only
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+    if original.format and any(key in original.info for key in METADATA_KEYS):
+        # The original stays the <img> fallback, so it must not leak GPS/device tags either
+        _swap_in(storage, name, _cleaned_original(original, image, data))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    written = []
+    for width in DERIVATIVE_WIDTHS:
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        for fmt in available_formats():
+            target = derivative_name(name, width, fmt)
+            if storage.exists(target):
+                if not overwrite:
+                    continue
+                storage.delete(target)
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=QUALITY[fmt])
+            written.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return written
@@ -0,0 +1,300 @@
+"""
+Per-request query and latency instrumentation.
+
+``QueryStatsMiddleware`` counts every SQL statement a request runs (through an
+execute wrapper on every connection), its total SQL time, the time spent rendering
+templates and the slowest few statements. With ``QUERY_STATS_HEADERS`` on
+(the default under ``DEBUG``), the numbers are sent back as ``X-DB-*`` and
+``Server-Timing`` headers. Every request also feeds an in-process per-view
+aggregate, which the staff-only stats endpoint reports.
+
+Views declare how many queries they may run with ``@query_budget(n)``, or
+through ``settings.QUERY_BUDGETS`` keyed by URL name. An overrun is logged.
+With ``QUERY_BUDGET_ENFORCE`` on (as in tests through ``QueryBudgetTestMixin``),
+it raises :class:`QueryBudgetExceeded` instead, so an N+1 sneaking in through
+a template fails the suite.
+
+Queries are attributed through a context variable rather than by thread, so
+async views are covered too, including when several requests share one sync
+worker thread (``core.asgi``). The body of an async streaming response runs
+after the middleware has returned and is not counted.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_KEPT = 5
+SAMPLES_PER_VIEW = 500
+
+_current = contextvars.ContextVar('query_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Recorder:
+    """Totals for one request (or one ``record_queries()`` block), also fed to the enclosing one."""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.slowest = []
+        self._template_depth = 0
+
+    def add_query(self, elapsed, sql):
+        self.query_count += 1
+        self.sql_time += elapsed
+        self.slowest.append((elapsed, sql))
+        self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+        del self.slowest[SLOWEST_KEPT:]
+        if self.parent is not None:
+            self.parent.add_query(elapsed, sql)
+
+    def as_dict(self):
+        return {
+            'queries': self.query_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'slowest': [{'ms': round(elapsed * 1000, 2), 'sql': sql} for elapsed, sql in self.slowest],
+        }
+
+
+@contextmanager
+def record_queries():
+    """Collects query/template stats for the block on every configured database."""
+    install_query_hook()
+    recorder = Recorder(parent=_current.get())
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+def _dispatch(execute, sql, params, many, context):
+    # Installed once per connection; reports to whichever recorder the calling context holds
+    recorder = _current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add_query(time.perf_counter() - started, sql)
+
+
+def _hook_connection(connection, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+def install_query_hook():
+    """Hooks this thread's connections now and every other thread's as they connect."""
+    connection_created.connect(_hook_connection, dispatch_uid='core.instrumentation.query_hook')
+    for alias in connections:
+        _hook_connection(connections[alias])
+
+
+# ----------------------------------------
+# TEMPLATE TIMING
+# ----------------------------------------
+# Django only emits template signals under the test runner, so Template.render
+# is wrapped instead (once, when the middleware loads). {% include %} goes
+# through it as well; only the outermost render is timed.
+_original_render = Template.render
+
+
+def _timed_render(self, context):
+    recorder = _current.get()
+    if recorder is None:
+        return _original_render(self, context)
+    outermost = not recorder._template_depth
+    recorder._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        recorder._template_depth -= 1
+        if outermost:
+            recorder.template_time += time.perf_counter() - started
+
+
+def install_template_timer():
+    Template.render = _timed_render
+
+
+# ----------------------------------------
+# QUERY BUDGETS
+# ----------------------------------------
+def query_budget(max_queries):
+    """Declares the most SQL statements one request to the decorated view may run."""
+    def decorate(view):
+        view.query_budget = max_queries
+        return view
+    return decorate
+
+
+def budget_for(view_name, view_func):
+    overrides = getattr(settings, 'QUERY_BUDGETS', {})
+    if view_name in overrides:
+        return overrides[view_name]
+    return getattr(view_func, 'query_budget', None)
+
+
+# ----------------------------------------
+# PER-VIEW AGGREGATES
+# ----------------------------------------
+class ViewStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, view_name, duration, recorder):
+        with self._lock:
+            entry = self._views.get(view_name)
+            if entry is None:
+                entry = self._views[view_name] = {
+                    'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_time': 0.0,
+                    'template_time': 0.0, 'durations': deque(maxlen=SAMPLES_PER_VIEW),
+                }
+            entry['requests'] += 1
+            entry['queries'] += recorder.query_count
+            entry['max_queries'] = max(entry['max_queries'], recorder.query_count)
+            entry['sql_time'] += recorder.sql_time
+            entry['template_time'] += recorder.template_time
+            entry['durations'].append(duration)
+
+    def snapshot(self):
+        with self._lock:
+            views = {name: dict(entry, durations=sorted(entry['durations'])) for name, entry in self._views.items()}
+        report = {}
+        for name, entry in sorted(views.items()):
+            requests, durations = entry['requests'], entry['durations']
+            report[name] = {
+                'requests': requests,
+                'avg_queries': round(entry['queries'] / requests, 2),
+                'max_queries': entry['max_queries'],
+                'avg_sql_ms': round(entry['sql_time'] * 1000 / requests, 2),
+                'avg_template_ms': round(entry['template_time'] * 1000 / requests, 2),
+                'p50_ms': _ms(percentile(durations, 50)),
+                'p95_ms': _ms(percentile(durations, 95)),
+                'p99_ms': _ms(percentile(durations, 99)),
+            }
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+view_stats = ViewStats()
+
+
+# ----------------------------------------
+# MIDDLEWARE
+# ----------------------------------------
+class QueryStatsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install_template_timer()
+        install_query_hook()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    def report(self, request, response, recorder, duration):
+        match = request.resolver_match
+        if match is None:
+            return response
+        view_name = match.view_name
+        view_stats.add(view_name, duration, recorder)
+
+        if getattr(settings, 'QUERY_STATS_HEADERS', settings.DEBUG):
+            response['X-DB-Query-Count'] = str(recorder.query_count)
+            response['X-DB-Time-Ms'] = f'{recorder.sql_time * 1000:.2f}'
+            response['X-Template-Time-Ms'] = f'{recorder.template_time * 1000:.2f}'
+            response['Server-Timing'] = (
+                f'db;dur={recorder.sql_time * 1000:.2f};desc="{recorder.query_count} queries", '
+                f'tpl;dur={recorder.template_time * 1000:.2f}, total;dur={duration * 1000:.2f}'
+            )
+
+        budget = budget_for(view_name, match.func)
+        if budget is not None and recorder.query_count > budget:
+            detail = f'{view_name} ran {recorder.query_count} queries (budget {budget}).'
+            if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                raise QueryBudgetExceeded(detail)
+            logger.warning('QUERY BUDGET EXCEEDED: %s', detail)
+        return response
+
+
+# ----------------------------------------
+# TEST HELPERS
+# ----------------------------------------
+class QueryBudgetTestMixin:
+    """
+    ``TestCase`` mixin: turns budget overruns into failures for every request
+    made through the test client, and adds :meth:`assertMaxQueries`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from django.test import override_settings
+        cls._budget_override = override_settings(QUERY_BUDGET_ENFORCE=True)
+        cls._budget_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._budget_override.disable()
+        super().tearDownClass()
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries):
+        with record_queries() as recorder:
+            yield recorder
+        if recorder.query_count > max_queries:
+            statements = '\n'.join(f"  {entry['ms']}ms {entry['sql']}" for entry in recorder.as_dict()['slowest'])
+            self.fail(f'{recorder.query_count} queries run, expected at most {max_queries}. Slowest:\n{statements}')
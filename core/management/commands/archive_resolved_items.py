@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_resolved
+
+
+class Command(BaseCommand):
+    help = "Moves items resolved more than ITEM_ARCHIVE_AFTER_DAYS ago from Item into the ArchivedItem table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Override ITEM_ARCHIVE_AFTER_DAYS for this run.")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Items moved per transaction; smaller batches hold locks for less time.")
+        parser.add_argument('--dry-run', action='store_true', help="Count archivable items without moving them.")
+
+    def handle(self, *args, **options):
+        moved = archive_resolved(days=options['days'], batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = "WOULD ARCHIVE" if options['dry_run'] else "ARCHIVED"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} RESOLVED SIGNALS TO COLD STORAGE."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.transfer import FORMATS, TABLES, export
+
+
+class Command(BaseCommand):
+    help = "Streams items, conversations, messages, notifications and claims to one NDJSON or CSV file per table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Output directory (created if missing).")
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help="Compress every file (.gz).")
+        parser.add_argument('--tables', nargs='+', choices=[table.name for table in TABLES],
+                            help="Only these tables (default: all).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        counts = export(
+            options['directory'], options['tables'], fmt=options['format'],
+            compress=options['gzip'], chunk_size=options['chunk_size'],
+        )
+        summary = ", ".join(f"{count} {name.upper()}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"EXPORT COMPLETE: {summary}."))
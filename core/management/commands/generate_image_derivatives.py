@@ -0,0 +1,40 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from core.images import MEDIA_DIRS, generate_derivatives, is_derivative
+
+
+class Command(BaseCommand):
+    help = "Writes missing WebP/AVIF thumbnails next to every uploaded image in the media folders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate derivatives that already exist.")
+        parser.add_argument('--dir', action='append', dest='dirs', choices=MEDIA_DIRS, help="Limit to one media folder (repeatable).")
+
+    def handle(self, *args, **options):
+        originals, written, skipped = 0, 0, 0
+        for directory in options['dirs'] or MEDIA_DIRS:
+            for name in self._walk(directory):
+                if is_derivative(name):
+                    continue
+                try:
+                    written += len(generate_derivatives(default_storage, name, overwrite=options['force']))
+                except (UnidentifiedImageError, OSError) as exc:
+                    skipped += 1
+                    self.stderr.write(f"SKIPPED {name}: {exc}")
+                    continue
+                originals += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"DERIVATIVE BACKFILL COMPLETE: {written} FILES WRITTEN FOR {originals} IMAGES ({skipped} UNREADABLE)."
+        ))
+
+    def _walk(self, directory):
+        if not default_storage.exists(directory):
+            return
+        subdirs, files = default_storage.listdir(directory)
+        for filename in sorted(files):
+            yield f'{directory}/{filename}'
+        for subdir in sorted(subdirs):
+            yield from self._walk(f'{directory}/{subdir}')
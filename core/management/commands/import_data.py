@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.transfer import TABLES, load
+
+
+class Command(BaseCommand):
+    help = "Loads an export_data directory back in with batched bulk inserts, remapping every foreign key."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory written by export_data.")
+        parser.add_argument('--tables', nargs='+', choices=[table.name for table in TABLES],
+                            help="Only these tables (default: all).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk insert and transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            counts = load(options['directory'], options['tables'], batch_size=options['batch_size'])
+        except RuntimeError as exc:
+            raise CommandError(exc)
+        if not counts:
+            raise CommandError(f"No export files found in {options['directory']}.")
+        for name, (loaded, skipped) in counts.items():
+            note = f" ({skipped} SKIPPED: PARENT MISSING)" if skipped else ""
+            self.stdout.write(f"{name.upper()}: {loaded} LOADED{note}")
+        self.stdout.write(self.style.SUCCESS("IMPORT COMPLETE: SIGNALS RESTORED TO THE NETWORK."))
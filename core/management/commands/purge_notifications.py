@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.retention import NdjsonArchive, TableArchive, purge
+
+
+class Command(BaseCommand):
+    help = "Archives and deletes notifications past their per-kind retention (NOTIFICATION_TTLS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive', choices=('table', 'ndjson', 'none'), default='table',
+                            help="Where expired rows go: the archive table, gzipped NDJSON files, or nowhere.")
+        parser.add_argument('--path', default=str(settings.BASE_DIR / 'archive'),
+                            help="Directory for --archive ndjson.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Count expired rows without touching them.")
+
+    def handle(self, *args, **options):
+        archive = {
+            'table': TableArchive,
+            'ndjson': lambda: NdjsonArchive(options['path']),
+            'none': lambda: None,
+        }[options['archive']]()
+        purged = purge(archive, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = "WOULD PURGE" if options['dry_run'] else "PURGED"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {purged} EXPIRED SYSTEM LOGS."))
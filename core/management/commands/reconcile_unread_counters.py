@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.models import UnreadCounter
+
+
+class Command(BaseCommand):
+    help = "Recomputes every per-user unread message counter from the Message table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = UnreadCounter.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"UNREAD COUNTERS RECONCILED: {users} NODES WITH PENDING COMMS."))
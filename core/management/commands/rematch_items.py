@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.matching import rematch_all
+
+
+class Command(BaseCommand):
+    help = "Re-scores every active LOST item against every active FOUND item and announces new matches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: one per CPU).")
+        parser.add_argument('--chunk-size', type=int, default=256, help="LOST items scored per worker task.")
+
+    def handle(self, *args, **options):
+        announced = rematch_all(processes=options['processes'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"MATCH SWEEP COMPLETE: {announced} NEW CORRELATIONS BROADCAST."))
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from core import benchmark
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the hot views in-process and reports p50/p95/p99 latency and query counts as JSON. "
+        "Run once per settings profile (--settings) and --compare to see what a profile buys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to browse as (default: the user in the most conversations).")
+        parser.add_argument('--requests', type=int, default=50, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='+', metavar='SCENARIO', help="Run just these scenarios.")
+        parser.add_argument('--asgi', action='store_true', help="Use the async test client (latency only).")
+        parser.add_argument('--concurrency', type=int, default=1, help="Client threads per scenario (WSGI path only).")
+        parser.add_argument('--label', default='')
+        parser.add_argument('--output', help="JSON file for the results (default: benchmark-<timestamp>.json).")
+        parser.add_argument('--compare', metavar='BASELINE', help="Earlier results file to diff p95 against.")
+        parser.add_argument('--fragments', type=int, nargs='?', const=50, metavar='ITEMS',
+                            help="Instead of the scenarios, time cold vs warm fragment-cached renders of an ITEMS-card feed page.")
+
+    def handle(self, *args, **options):
+        if options['fragments']:
+            return self.handle_fragments(options)
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.annotate(load=Count('conversations')).order_by('-load', 'pk').first()
+        if user is None:
+            raise CommandError("NO USER TO BROWSE AS: SEED DATA FIRST (seed_synthetic_data).")
+
+        scenarios = benchmark.default_scenarios(user)
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f"UNKNOWN SCENARIOS: {', '.join(sorted(unknown))}.")
+            scenarios = {name: scenarios[name] for name in options['only']}
+
+        report = benchmark.run(
+            scenarios, user, requests=options['requests'], warmup=options['warmup'],
+            use_asgi=options['asgi'], label=options['label'], concurrency=options['concurrency'],
+        )
+        for name, result in report['scenarios'].items():
+            queries = result['queries']
+            self.stdout.write(
+                f"{name:<22} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+                f"p99 {result['p99_ms']:>9.2f}ms  queries {queries['max'] if queries else '-':>4}  {result['statuses']}"
+            )
+
+        output = options['output'] or f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        benchmark.save(report, output)
+        self.stdout.write(self.style.SUCCESS(f"BENCHMARK COMPLETE: RESULTS WRITTEN TO {output}."))
+
+        if options['compare']:
+            for name, before, after, change, rps_before, rps_after in benchmark.compare(benchmark.load(options['compare']), report):
+                self.stdout.write(
+                    f"{name:<22} p95 {before:>9.2f}ms -> {after:>9.2f}ms ({change:+.1f}%)  "
+                    f"throughput {rps_before:>7.1f} -> {rps_after:>7.1f} req/s"
+                )
+
+    def handle_fragments(self, options):
+        result = benchmark.run_fragments(per_page=options['fragments'], rounds=options['requests'])
+        if not result['items']:
+            raise CommandError("NO ITEMS TO RENDER: SEED DATA FIRST (seed_synthetic_data).")
+        for phase in ('cold', 'warm'):
+            timing = result[phase]
+            self.stdout.write(
+                f"{phase:<6} {result['items']} cards  p50 {timing['p50_ms']:>9.2f}ms  p95 {timing['p95_ms']:>9.2f}ms  "
+                f"p99 {timing['p99_ms']:>9.2f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"FRAGMENT CACHE SPEEDUP: {result['speedup']}x (p50)."))
+        if options['output']:
+            benchmark.save({'label': options['label'], 'fragments': result}, options['output'])
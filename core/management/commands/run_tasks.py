@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import STALE_AFTER, requeue_stale, run_workers, schedule_message_digest
+
+
+class Command(BaseCommand):
+    help = "Runs background job workers against the Job table (no external broker needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Worker threads in this process.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds an idle worker sleeps between checks.")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is drained.")
+
+    def handle(self, *args, **options):
+        freed = requeue_stale(STALE_AFTER)
+        if freed:
+            self.stdout.write(self.style.WARNING(f"REQUEUED {freed} STALLED JOBS."))
+        if schedule_message_digest():
+            self.stdout.write("MESSAGE DIGEST SCHEDULED.")
+        self.stdout.write(f"TASK RUNNER ONLINE: {options['workers']} WORKERS.")
+        processed = run_workers(options['workers'], poll_interval=options['poll_interval'], burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f"TASK RUNNER OFFLINE: {processed} JOBS PROCESSED."))
@@ -0,0 +1,248 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.geo import encode
+from core.models import ArchivedItem, Conversation, ConversationParticipant, Item, Message, Notification, Profile, ResolutionRequest, UnreadCounter
+from core.search import get_search_backend
+from core.transfer import manual_timestamps
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'synth_'
+
+OBJECTS = ['wallet', 'phone', 'keys', 'backpack', 'umbrella', 'laptop', 'id card', 'watch', 'earbuds',
+           'eyeglasses', 'tumbler', 'jacket', 'charger', 'passport', 'ring', 'camera', 'notebook', 'cat', 'dog']
+COLOURS = ['black', 'brown', 'blue', 'red', 'white', 'silver', 'green', 'pink', 'grey', 'yellow']
+BRANDS = ['', '', '', 'apple', 'samsung', 'nike', 'jansport', 'casio', 'hydro flask', 'ray-ban', 'xiaomi']
+PLACES = [
+    ('SM North EDSA', 14.6565, 121.0289), ('UP Diliman', 14.6538, 121.0685), ('Cubao MRT', 14.6195, 121.0511),
+    ('BGC High Street', 14.5509, 121.0509), ('Makati Ayala', 14.5547, 121.0244), ('Intramuros', 14.5896, 120.9747),
+    ('Ortigas Center', 14.5869, 121.0614), ('Marikina Riverbanks', 14.6321, 121.0830), ('Pasay Rotonda', 14.5378, 121.0014),
+    ('Quiapo Church', 14.5986, 120.9836), ('Alabang Town Center', 14.4231, 121.0300), ('Baguio Session Road', 16.4115, 120.5960),
+]
+CHAT_LINES = ['Is this yours?', 'Where did you find it?', 'Can you describe it?', 'It has a sticker on the back.',
+              'I can meet tomorrow.', 'Thanks so much!', 'Sending a photo now.', 'What colour is the strap?']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds reproducible synthetic users, items, conversations, messages, notifications and claims "
+        "with skewed (Pareto) activity, in constant-size bulk batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--items', type=int, default=5000)
+        parser.add_argument('--conversations', type=int, default=2000)
+        parser.add_argument('--messages', type=int, default=20000)
+        parser.add_argument('--notifications', type=int, default=10000)
+        parser.add_argument('--claims', type=int, default=800)
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiplies every count above.")
+        parser.add_argument('--days', type=int, default=365, help="History window the timestamps spread over.")
+        parser.add_argument('--seed', type=int, default=1337)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help="Delete previously seeded synthetic users (and their data) first.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.window = timedelta(days=options['days'])
+        counts = {key: max(1, int(options[key] * options['scale']))
+                  for key in ('users', 'items', 'conversations', 'messages', 'notifications', 'claims')}
+
+        if options['flush']:
+            deleted, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f"FLUSHED {deleted} SYNTHETIC ROWS.")
+
+        with manual_timestamps(Item, Conversation, Message, Notification, ResolutionRequest):
+            users = self.seed_users(counts['users'])
+            # A few heavy users produce most of the traffic
+            user_weights = list(accumulate(self.rng.paretovariate(1.16) for _ in users))
+            items = self.seed_items(counts['items'], users, user_weights)
+            conversations = self.seed_conversations(counts['conversations'], users, items)
+            self.seed_messages(counts['messages'], conversations)
+            self.seed_notifications(counts['notifications'], users, user_weights)
+            self.seed_claims(counts['claims'], users, items)
+
+        self.stdout.write("REBUILDING SEARCH INDEX AND UNREAD COUNTERS...")
+        get_search_backend().rebuild(Item.objects.all(), ArchivedItem.objects.all(), chunk_size=self.batch_size)
+        UnreadCounter.reconcile(batch_size=self.batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            "SYNTHETIC NETWORK ONLINE: " + ", ".join(f"{count} {name.upper()}" for name, count in counts.items()) + "."
+        ))
+
+    # ----------------------------------------
+    # GENERATORS
+    # ----------------------------------------
+    def _insert(self, model, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def _moment(self, after=None):
+        """Random timestamp, skewed toward the recent end of the window."""
+        start = after or self.now - self.window
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=span * (1 - self.rng.random() ** 3))
+
+    def seed_users(self, count):
+        password = make_password('synthetic')
+        first = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        self._insert(User, (
+            User(username=f'{USERNAME_PREFIX}{n:07d}', password=password, email=f'{USERNAME_PREFIX}{n}@example.com')
+            for n in range(first, first + count)
+        ))
+        users = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk').values_list('pk', flat=True))
+        users = users[-count:]
+        self._insert(Profile, (Profile(user_id=pk) for pk in users))
+        return users
+
+    def seed_items(self, count, users, user_weights):
+        rng = self.rng
+        owners = rng.choices(users, cum_weights=user_weights, k=count)
+
+        def rows():
+            for owner in owners:
+                created = self._moment()
+                place, lat, lon = rng.choice(PLACES)
+                title = ' '.join(part for part in (rng.choice(COLOURS), rng.choice(BRANDS), rng.choice(OBJECTS)) if part)
+                status = rng.choices((Item.STATUS_ACTIVE, Item.STATUS_PENDING, Item.STATUS_RESOLVED), (70, 10, 20))[0]
+                item = Item(
+                    title=title.title(), description=f"{title} last seen near {place}. Reward offered.",
+                    item_type=rng.choices((Item.LOST, Item.FOUND), (60, 40))[0], location=place,
+                    date_happened=(created - timedelta(days=rng.randint(0, 5))).date(), status=status,
+                    is_active=status != Item.STATUS_RESOLVED, user_id=owner, created_at=created, updated_at=created,
+                    resolved_at=created + timedelta(days=rng.randint(1, 30)) if status == Item.STATUS_RESOLVED else None,
+                )
+                if rng.random() < 0.7:
+                    item.latitude = Decimal(f'{lat + rng.gauss(0, 0.01):.6f}')
+                    item.longitude = Decimal(f'{lon + rng.gauss(0, 0.01):.6f}')
+                    item.geohash = encode(float(item.latitude), float(item.longitude))
+                yield item
+
+        first = Item.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self._insert(Item, rows())
+        return list(Item.objects.filter(pk__gt=first).order_by('pk').values_list('pk', 'user_id', 'created_at', 'status'))
+
+    def seed_conversations(self, count, users, items):
+        rng = self.rng
+        # Popular items attract most of the conversations
+        weights = list(accumulate(rng.paretovariate(1.5) for _ in items))
+        picked = rng.choices(items, cum_weights=weights, k=count)
+        first = Conversation.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        taken = set(Conversation.objects.values_list('item_id', 'user_a_id', 'user_b_id'))
+        pairs = []
+
+        def rows():
+            for item_id, owner, created, _ in picked:
+                other = rng.choice(users)
+                if other == owner:
+                    continue
+                user_a, user_b = sorted((owner, other))
+                # One thread per (item, pair), as the unique key demands
+                if (item_id, user_a, user_b) in taken:
+                    continue
+                taken.add((item_id, user_a, user_b))
+                pairs.append((owner, other))
+                started = self._moment(created)
+                yield Conversation(item_id=item_id, user_a_id=user_a, user_b_id=user_b, created_at=started, updated_at=started)
+
+        self._insert(Conversation, rows())
+        conversations = list(Conversation.objects.filter(pk__gt=first).order_by('pk').values_list('pk', 'created_at'))
+        self._insert(ConversationParticipant, (
+            ConversationParticipant(conversation_id=pk, user_id=user)
+            for (pk, _), pair in zip(conversations, pairs) for user in pair
+        ))
+        return [(pk, created, pair) for (pk, created), pair in zip(conversations, pairs)]
+
+    def seed_messages(self, count, conversations):
+        rng = self.rng
+        if not conversations:
+            return
+        # Most threads are a couple of lines; a few negotiations run very long
+        weights = list(accumulate(rng.paretovariate(2.0) for _ in conversations))
+        remaining = count
+        while remaining:
+            chunk = min(remaining, self.batch_size)
+            remaining -= chunk
+            rows = []
+            for pk, created, pair in rng.choices(conversations, cum_weights=weights, k=chunk):
+                rows.append(Message(
+                    conversation_id=pk, sender_id=rng.choice(pair), body=rng.choice(CHAT_LINES),
+                    timestamp=self._moment(created),
+                ))
+            rows.sort(key=lambda message: message.timestamp)
+            self._insert(Message, rows)
+        # The inbox orders by updated_at, which real traffic bumps on every send
+        last_sent = Message.objects.filter(conversation=OuterRef('pk')).values('conversation').annotate(last=Max('timestamp')).values('last')
+        Conversation.objects.filter(pk__gte=conversations[0][0]).update(
+            updated_at=Coalesce(Subquery(last_sent), 'created_at')
+        )
+        # Members have read their threads up to the latest message, except ~15% still three behind
+        thread = Message.objects.filter(conversation=OuterRef('conversation')).order_by('-pk').values('pk')
+        memberships = ConversationParticipant.objects.filter(conversation_id__gte=conversations[0][0])
+        memberships.update(last_read_message_id=Coalesce(Subquery(thread[:1]), 0))
+        behind = [pk for pk in memberships.values_list('pk', flat=True) if rng.random() < 0.15]
+        for start in range(0, len(behind), self.batch_size):
+            memberships.filter(pk__in=behind[start:start + self.batch_size]).update(
+                last_read_message_id=Coalesce(Subquery(thread[3:4]), 0)
+            )
+
+    def seed_notifications(self, count, users, user_weights):
+        rng = self.rng
+        recipients = rng.choices(users, cum_weights=user_weights, k=count)
+        samples = (
+            (Notification.KIND_MESSAGE, 'NEW COMMS FROM @SYNTH.'),
+            (Notification.KIND_MATCH, 'POSSIBLE MATCH DETECTED.'),
+            (Notification.KIND_HANDSHAKE, 'NEW HANDSHAKE REQUEST.'),
+        )
+
+        def rows():
+            for user in recipients:
+                kind, text = rng.choice(samples)
+                moment = self._moment()
+                yield Notification(
+                    user_id=user, kind=kind, text=text, is_read=rng.random() < 0.8, created_at=moment, updated_at=moment,
+                )
+        self._insert(Notification, rows())
+
+    def seed_claims(self, count, users, items):
+        rng = self.rng
+        seen = set()
+        claimable = [item for item in items if item[3] != Item.STATUS_ACTIVE] or items
+
+        def rows():
+            for _ in range(count * 3):
+                if len(seen) >= count:
+                    return
+                item_id, owner, created, status = rng.choice(claimable)
+                claimant = rng.choice(users)
+                if claimant == owner or (item_id, claimant) in seen:
+                    continue
+                seen.add((item_id, claimant))
+                resolved = status == Item.STATUS_RESOLVED
+                moment = self._moment(created)
+                yield ResolutionRequest(
+                    item_id=item_id, claimant_id=claimant, claimant_confirmed=True, reporter_confirmed=resolved,
+                    created_at=moment, updated_at=moment,
+                )
+
+        self._insert(ResolutionRequest, rows())
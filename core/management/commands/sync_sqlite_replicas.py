@@ -0,0 +1,35 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database into every SQLite read replica (local stand-in for replication)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep syncing every N seconds, simulating replication lag.")
+
+    def handle(self, *args, **options):
+        replicas = [settings.DATABASES[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError("No read replicas configured. Set SQLITE_REPLICAS.")
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if any('sqlite3' not in db['ENGINE'] for db in (primary, *replicas)):
+            raise CommandError("Only SQLite primaries and replicas can be synced this way.")
+        while True:
+            for replica in replicas:
+                self.sync(primary['NAME'], replica['NAME'])
+            self.stdout.write(self.style.SUCCESS(f"REPLICAS SYNCED: {len(replicas)} NODES MIRRORING PRIMARY."))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, source, target):
+        # The backup API copies a consistent snapshot even while the primary is being written
+        with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+            src.backup(dst)
@@ -0,0 +1,258 @@
+"""
+Lost <-> found matching engine.
+
+Every active LOST report is scored against every active FOUND report (and vice
+versa for a fresh item) on three signals, all computed as NumPy matrix
+operations over blocks of candidates:
+
+* text     - cosine similarity of hashed TF-IDF vectors over title + description
+* location - haversine proximity when both items carry coordinates, otherwise
+             cosine similarity of the free-text ``location`` strings
+* date     - exponential decay on the gap between ``date_happened`` values
+
+The best few candidates above ``MATCH_THRESHOLD`` are recorded as ``ItemMatch``
+rows and announced to both owners as ``Notification``\\s, once per pair.
+"""
+import math
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.db import connections
+
+from .search import tokenize
+
+FEATURES = 2 ** 11          # hashed vocabulary size
+BLOCK_SIZE = 2048           # candidates densified per matrix product
+WEIGHTS = (0.6, 0.25, 0.15)  # text, location, date
+GEO_SCALE_KM = 3.0
+DATE_SCALE_DAYS = 14.0
+MATCH_THRESHOLD = 0.45
+TOP_K = 3
+INCREMENTAL_WINDOW_DAYS = 90
+INCREMENTAL_MAX_CANDIDATES = 20000
+EARTH_RADIUS_KM = 6371.0
+
+ITEM_FIELDS = ('pk', 'user_id', 'item_type', 'title', 'description', 'location', 'latitude', 'longitude', 'date_happened')
+
+
+def hashed_counts(text):
+    """Sparse term counts keyed by a stable (process-independent) hash bucket."""
+    counts = {}
+    for token in tokenize(text):
+        bucket = zlib.crc32(token.encode()) % FEATURES
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+class Corpus:
+    """Column-oriented snapshot of items, ready for vectorized scoring."""
+
+    def __init__(self, rows):
+        self.ids = np.array([row['pk'] for row in rows], dtype=np.int64)
+        self.user_ids = np.array([row['user_id'] for row in rows], dtype=np.int64)
+        self.titles = [row['title'] for row in rows]
+        self.text = [hashed_counts(f"{row['title']} {row['description']}") for row in rows]
+        self.place = [hashed_counts(row['location']) for row in rows]
+        self.lat = np.radians(np.array([_coord(row['latitude']) for row in rows], dtype=np.float64))
+        self.lon = np.radians(np.array([_coord(row['longitude']) for row in rows], dtype=np.float64))
+        self.day = np.array([row['date_happened'].toordinal() for row in rows], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def dense(self, column, idf, start, stop):
+        """L2-normalized TF-IDF matrix for rows ``start:stop`` of ``column`` ('text' or 'place')."""
+        docs = getattr(self, column)[start:stop]
+        matrix = np.zeros((len(docs), FEATURES), dtype=np.float32)
+        for row, counts in enumerate(docs):
+            if counts:
+                cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                matrix[row, cols] = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+def _coord(value):
+    return math.nan if value is None else float(value)
+
+
+def inverse_document_frequency(*corpora):
+    """Smoothed IDF per hash bucket, separately for the text and place columns."""
+    idf = {}
+    for column in ('text', 'place'):
+        df = np.zeros(FEATURES, dtype=np.float32)
+        total = 0
+        for corpus in corpora:
+            for counts in getattr(corpus, column):
+                if counts:
+                    df[list(counts)] += 1
+            total += len(corpus)
+        idf[column] = (np.log((1 + total) / (1 + df)) + 1).astype(np.float32)
+    return idf
+
+
+def score_block(queries, candidates, idf, q_start, q_stop, c_start, c_stop):
+    """Combined similarity matrix of shape (query rows, candidate rows)."""
+    text = queries.dense('text', idf['text'], q_start, q_stop) @ candidates.dense('text', idf['text'], c_start, c_stop).T
+    place = queries.dense('place', idf['place'], q_start, q_stop) @ candidates.dense('place', idf['place'], c_start, c_stop).T
+
+    q_lat, q_lon = queries.lat[q_start:q_stop, None], queries.lon[q_start:q_stop, None]
+    c_lat, c_lon = candidates.lat[None, c_start:c_stop], candidates.lon[None, c_start:c_stop]
+    haversine = (
+        np.sin((c_lat - q_lat) / 2) ** 2
+        + np.cos(q_lat) * np.cos(c_lat) * np.sin((c_lon - q_lon) / 2) ** 2
+    )
+    with np.errstate(invalid='ignore'):
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+    location = np.where(np.isnan(km), place, np.exp(-km / GEO_SCALE_KM))
+
+    gap = np.abs(queries.day[q_start:q_stop, None] - candidates.day[None, c_start:c_stop])
+    date = np.exp(-gap / DATE_SCALE_DAYS)
+
+    score = WEIGHTS[0] * text + WEIGHTS[1] * location + WEIGHTS[2] * date
+    # Nobody gets matched against their own reports.
+    score[queries.user_ids[q_start:q_stop, None] == candidates.user_ids[None, c_start:c_stop]] = -np.inf
+    return score
+
+
+def top_matches(queries, candidates, idf, q_start=0, q_stop=None, top_k=TOP_K, threshold=MATCH_THRESHOLD):
+    """
+    Best ``top_k`` candidates per query row, streamed over candidate blocks so
+    memory stays at one (query chunk x BLOCK_SIZE) matrix. Returns a list of
+    ``(query_index, candidate_index, score)`` above ``threshold``.
+    """
+    q_stop = len(queries) if q_stop is None else q_stop
+    rows = q_stop - q_start
+    if not rows or not len(candidates):
+        return []
+    best_score = np.full((rows, top_k), -np.inf)
+    best_index = np.full((rows, top_k), -1, dtype=np.int64)
+    for c_start in range(0, len(candidates), BLOCK_SIZE):
+        c_stop = min(c_start + BLOCK_SIZE, len(candidates))
+        block = score_block(queries, candidates, idf, q_start, q_stop, c_start, c_stop)
+        merged_score = np.concatenate([best_score, block], axis=1)
+        merged_index = np.concatenate([best_index, np.broadcast_to(np.arange(c_start, c_stop), block.shape)], axis=1)
+        keep = np.argsort(-merged_score, axis=1)[:, :top_k]
+        best_score = np.take_along_axis(merged_score, keep, axis=1)
+        best_index = np.take_along_axis(merged_index, keep, axis=1)
+    found = np.argwhere(best_score >= threshold)
+    return [
+        (q_start + int(row), int(best_index[row, col]), float(best_score[row, col]))
+        for row, col in found
+    ]
+
+
+# ----------------------------------------
+# PROCESS POOL (BATCH MODE)
+# ----------------------------------------
+_worker_state = {}
+
+def _init_worker(queries, candidates, idf):
+    _worker_state.update(queries=queries, candidates=candidates, idf=idf)
+
+def _score_chunk(bounds):
+    state = _worker_state
+    return top_matches(state['queries'], state['candidates'], state['idf'], *bounds)
+
+
+# ----------------------------------------
+# DATABASE ENTRY POINTS
+# ----------------------------------------
+# Models are imported inside these functions: pool workers unpickle this module
+# under the "spawn" start method before Django is configured.
+
+def _active_rows(item_type, limit=None, **filters):
+    from .models import Item
+    rows = (
+        Item.objects.filter(item_type=item_type, status=Item.STATUS_ACTIVE, is_active=True, **filters)
+        .order_by('-created_at')
+        .values(*ITEM_FIELDS)
+    )
+    return list(rows[:limit] if limit else rows)
+
+def record_matches(pairs):
+    """
+    Stores ``(lost_id, found_id, score, lost_title, found_title, lost_user, found_user)``
+    pairs and notifies both owners about each pair seen for the first time.
+    Returns how many new matches were announced.
+    """
+    from .models import ItemMatch, Notification
+    from .notifications import send
+    if not pairs:
+        return 0
+    existing = set(
+        ItemMatch.objects.filter(
+            lost_item_id__in={pair[0] for pair in pairs}, found_item_id__in={pair[1] for pair in pairs}
+        ).values_list('lost_item_id', 'found_item_id')
+    )
+    fresh = [pair for pair in pairs if (pair[0], pair[1]) not in existing]
+    ItemMatch.objects.bulk_create(
+        [ItemMatch(lost_item_id=lost, found_item_id=found, score=score) for lost, found, score, *_ in fresh],
+        ignore_conflicts=True,
+    )
+    alerts = []
+    for lost, found, score, lost_title, found_title, lost_user, found_user in fresh:
+        percent = round(score * 100)
+        alerts += [
+            Notification(
+                user_id=lost_user, kind=Notification.KIND_MATCH,
+                text=f"POSSIBLE MATCH: FOUND REPORT '{found_title.upper()}' ({percent}%) FOR {lost_title.upper()}."[:255],
+            ),
+            Notification(
+                user_id=found_user, kind=Notification.KIND_MATCH,
+                text=f"POSSIBLE MATCH: LOST REPORT '{lost_title.upper()}' ({percent}%) FOR {found_title.upper()}."[:255],
+            ),
+        ]
+    send(alerts)
+    return len(fresh)
+
+def _as_pairs(lost, found, matches, lost_is_query):
+    pairs = []
+    for q, c, score in matches:
+        l, f = (q, c) if lost_is_query else (c, q)
+        pairs.append((
+            int(lost.ids[l]), int(found.ids[f]), score,
+            lost.titles[l], found.titles[f], int(lost.user_ids[l]), int(found.user_ids[f]),
+        ))
+    return pairs
+
+def match_item(item):
+    """Incremental mode: scores one freshly reported item against recent opposite-type items."""
+    from .models import Item
+    opposite = Item.FOUND if item.item_type == Item.LOST else Item.LOST
+    window = timedelta(days=INCREMENTAL_WINDOW_DAYS)
+    rows = _active_rows(
+        opposite,
+        limit=INCREMENTAL_MAX_CANDIDATES,
+        date_happened__gte=item.date_happened - window,
+        date_happened__lte=item.date_happened + window,
+    )
+    query = Corpus([{field: getattr(item, field) for field in ITEM_FIELDS}])
+    candidates = Corpus(rows)
+    matches = top_matches(query, candidates, inverse_document_frequency(query, candidates))
+    if item.item_type == Item.LOST:
+        return record_matches(_as_pairs(query, candidates, matches, lost_is_query=True))
+    return record_matches(_as_pairs(candidates, query, matches, lost_is_query=False))
+
+def rematch_all(processes=None, chunk_size=256):
+    """
+    Batch mode: re-scores every active LOST item against every active FOUND
+    item, fanning chunks of LOST rows out across a process pool.
+    """
+    from .models import Item
+    lost = Corpus(_active_rows(Item.LOST))
+    found = Corpus(_active_rows(Item.FOUND))
+    idf = inverse_document_frequency(lost, found)
+    bounds = [(start, min(start + chunk_size, len(lost))) for start in range(0, len(lost), chunk_size)]
+    if processes == 1 or len(bounds) <= 1:
+        matches = [match for chunk in bounds for match in top_matches(lost, found, idf, *chunk)]
+    else:
+        # Forked workers must not inherit live database sockets.
+        connections.close_all()
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(lost, found, idf)) as pool:
+            matches = [match for chunk in pool.map(_score_chunk, bounds) for match in chunk]
+    return record_matches(_as_pairs(lost, found, matches, lost_is_query=True))
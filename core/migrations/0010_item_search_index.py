@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from core.search import SQLiteFTS5Backend
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    backend = SQLiteFTS5Backend()
+    Item = apps.get_model('core', 'Item')
+    rows = Item.objects.order_by().values_list('pk', 'title', 'location', 'description')
+    with schema_editor.connection.cursor() as cursor:
+        backend.create_table(cursor)
+        backend.insert_rows(cursor, rows.iterator(chunk_size=1000))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        SQLiteFTS5Backend().drop_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_resolutionrequest_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def seed_unread_counters(apps, schema_editor):
+    Message = apps.get_model('core', 'Message')
+    UnreadCounter = apps.get_model('core', 'UnreadCounter')
+    totals = (
+        Message.objects.filter(is_read=False)
+        .exclude(sender=F('conversation__participants'))
+        .values_list('conversation__participants')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, count=total) for user_id, total in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0011_item_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_unread_counters, migrations.RunPython.noop),
+    ]
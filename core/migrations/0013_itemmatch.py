@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_unreadcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('found_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lost_matches', to='core.item')),
+                ('lost_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='found_matches', to='core.item')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'unique_together': {('lost_item', 'found_item')},
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def flags_to_watermarks(apps, schema_editor):
+    # Everything before a member's oldest unread incoming message counts as read
+    ConversationParticipant = apps.get_model('core', 'ConversationParticipant')
+    Message = apps.get_model('core', 'Message')
+    first_unread = (
+        Message.objects.filter(conversation=OuterRef('conversation'), is_read=False)
+        .exclude(sender=OuterRef('user'))
+        .order_by('pk')
+        .values('pk')[:1]
+    )
+    latest = Message.objects.filter(conversation=OuterRef('conversation')).order_by('-pk').values('pk')[:1]
+    ConversationParticipant.objects.update(
+        last_read_message_id=Coalesce(Subquery(first_unread) - 1, Subquery(latest), Value(0))
+    )
+
+
+def watermarks_to_flags(apps, schema_editor):
+    ConversationParticipant = apps.get_model('core', 'ConversationParticipant')
+    Message = apps.get_model('core', 'Message')
+    seen = ConversationParticipant.objects.filter(
+        conversation=OuterRef('conversation'), last_read_message_id__gte=OuterRef('pk')
+    ).exclude(user=OuterRef('sender'))
+    Message.objects.filter(Exists(seen)).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_message_conversation_timestamp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The auto-created M2M table becomes an explicit model without touching the rows
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='core.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'core_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='core.ConversationParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(flags_to_watermarks, watermarks_to_flags),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
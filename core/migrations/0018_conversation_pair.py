@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:05
+
+import logging
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Q
+
+logger = logging.getLogger(__name__)
+
+
+def fill_pairs(apps, schema_editor):
+    Conversation = apps.get_model('core', 'Conversation')
+    ConversationParticipant = apps.get_model('core', 'ConversationParticipant')
+    Item = apps.get_model('core', 'Item')
+    Message = apps.get_model('core', 'Message')
+
+    members = {}
+    for conversation_id, user_id in ConversationParticipant.objects.order_by('conversation_id', 'user_id').values_list('conversation_id', 'user_id'):
+        members.setdefault(conversation_id, []).append(user_id)
+
+    # Threads missing a membership row: the other side is usually still known
+    # from who wrote in the thread, or is the item's owner
+    conversations = list(Conversation.objects.order_by('pk').values_list('pk', 'item_id'))
+    short = [(conversation_id, item_id) for conversation_id, item_id in conversations if len(members.get(conversation_id, [])) < 2]
+    senders = {}
+    for conversation_id, sender_id in (
+        Message.objects.filter(conversation_id__in=[conversation_id for conversation_id, _ in short])
+        .order_by('conversation_id', 'pk').values_list('conversation_id', 'sender_id')
+    ):
+        senders.setdefault(conversation_id, []).append(sender_id)
+    owners = dict(Item.objects.filter(pk__in={item_id for _, item_id in short}).values_list('pk', 'user_id'))
+    for conversation_id, item_id in short:
+        known = members.setdefault(conversation_id, [])
+        candidates = [*senders.get(conversation_id, []), owners.get(item_id)]
+        added = list(dict.fromkeys(user_id for user_id in candidates if user_id is not None and user_id not in known))
+        added = added[:2 - len(known)]
+        ConversationParticipant.objects.bulk_create(
+            [ConversationParticipant(conversation_id=conversation_id, user_id=user_id) for user_id in added]
+        )
+        known += added
+        known.sort()
+
+    survivors = {}
+    for conversation_id, item_id in conversations:
+        pair = members[conversation_id][:2]
+        if len(pair) < 2:
+            # Nobody but one user ever touched it: there is no second party to key it on
+            logger.warning(
+                'Dropping conversation %s about item %s: only user %s can be found in it.',
+                conversation_id, item_id, pair[0] if pair else None,
+            )
+            Conversation.objects.filter(pk=conversation_id).delete()
+            continue
+        key = (item_id, *pair)
+        survivor = survivors.setdefault(key, conversation_id)
+        if survivor == conversation_id:
+            Conversation.objects.filter(pk=conversation_id).update(user_a_id=pair[0], user_b_id=pair[1])
+            continue
+        # Duplicate from concurrent clicks: fold it into the oldest thread for the same pair
+        Message.objects.filter(conversation_id=conversation_id).update(conversation_id=survivor)
+        for user_id, watermark in ConversationParticipant.objects.filter(conversation_id=conversation_id).values_list('user_id', 'last_read_message_id'):
+            ConversationParticipant.objects.filter(
+                conversation_id=survivor, user_id=user_id, last_read_message_id__lt=watermark
+            ).update(last_read_message_id=watermark)
+        latest = Conversation.objects.filter(pk=conversation_id).values_list('updated_at', flat=True).first()
+        Conversation.objects.filter(pk=survivor, updated_at__lt=latest).update(updated_at=latest)
+        Conversation.objects.filter(pk=conversation_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_conversation_read_watermarks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='user_a',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_b',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_pairs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='conversation',
+            name='user_a',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='conversation',
+            name='user_b',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('item', 'user_a', 'user_b'), name='core_conversation_pair_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(condition=Q(user_a__lt=F('user_b')), name='core_conversation_pair_ordered'),
+        ),
+    ]
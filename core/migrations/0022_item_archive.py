@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_notification_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversation',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='core.item'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedItem',
+            fields=[
+                ('title', models.CharField(db_index=True, max_length=200)),
+                ('description', models.TextField()),
+                ('item_type', models.CharField(choices=[('lost', 'Lost'), ('found', 'Found')], db_index=True, default='lost', max_length=10)),
+                ('location', models.CharField(db_index=True, max_length=200)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('geohash', models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12)),
+                ('date_happened', models.DateField()),
+                ('image', models.ImageField(blank=True, null=True, upload_to='item_images/')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('pending_resolve', 'Pending Resolution'), ('resolved', 'Resolved')], db_index=True, default='active', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_claimed', models.BooleanField(default=False)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('resolution_notes', models.TextField(blank=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='archived_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='core.archiveditem'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('archived_item', 'user_a', 'user_b'), name='core_conversation_archived_pair_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('archived_item__isnull', True), ('item__isnull', False)), models.Q(('archived_item__isnull', False), ('item__isnull', True)), _connector='OR'), name='core_conversation_one_subject'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveditem',
+            index=models.Index(fields=['created_at', 'id'], name='core_archiveditem_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveditem',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='core_archiveditem_user_idx'),
+        ),
+    ]
@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import BooleanField, Case, Count, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Greatest, Substr
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .geo import encode as geohash_encode
+
 User = get_user_model()
 
 # ----------------------------------------
@@ -18,6 +22,8 @@ class Profile(models.Model):
     # Cyber Metadata
     trust_score = models.IntegerField(default=98)
     security_clearance = models.CharField(max_length=20, default="Tier_01")
+    # Version stamp for cached avatar fragments
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"IDENTITY_NODE // {self.user.username}"
@@ -35,7 +41,8 @@ def manage_user_profile(sender, instance, created, **kwargs):
 # ----------------------------------------
 # 1. ITEM MODEL (SIGNAL BROADCASTER)
 # ----------------------------------------
-class Item(models.Model):
+class ItemRecord(models.Model):
+    """Columns shared by live items and their archived copies (``ArchivedItem``)."""
     LOST = 'lost'
     FOUND = 'found'
     STATUS_ACTIVE = 'active'
@@ -56,6 +63,7 @@ class Item(models.Model):
     location = models.CharField(max_length=200, db_index=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
 
     date_happened = models.DateField()
     image = models.ImageField(upload_to='item_images/', blank=True, null=True)
@@ -72,11 +80,7 @@ class Item(models.Model):
     resolution_notes = models.TextField(blank=True)
 
     class Meta:
-        ordering = ['-created_at']
-        indexes = [
-            models.Index(fields=['item_type', 'status']),
-            models.Index(fields=['location']),
-        ]
+        abstract = True
 
     def __str__(self):
         return f">> [ {self.get_item_type_display().upper()} ] : {self.title.upper()}"
@@ -86,54 +90,297 @@ class Item(models.Model):
     def is_archived(self):
         return self.status == self.STATUS_RESOLVED
 
+class Item(ItemRecord):
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['item_type', 'status']),
+            models.Index(fields=['location']),
+            # Keyset pagination seeks on (created_at, id), optionally scoped
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the spatial index column in step with the coordinates
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(float(self.latitude), float(self.longitude))
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+class ArchivedItem(ItemRecord):
+    """
+    A resolved item moved out of the hot table by ``core.archive`` once it has
+    been closed for ``ITEM_ARCHIVE_AFTER_DAYS``. It keeps the original pk, so
+    links, search index rows and cached cards stay valid.
+    """
+    id = models.BigIntegerField(primary_key=True)  # the original Item pk
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Copied from the live row, not stamped on insert
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='core_archiveditem_feed_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='core_archiveditem_user_idx'),
+        ]
+
 # ----------------------------------------
 # 2. CHAT SYSTEM (COMMS LINK)
 # ----------------------------------------
+class ConversationQuerySet(models.QuerySet):
+    def for_inbox(self, user):
+        """
+        Every conversation ``user`` is part of, annotated in the same query with
+        its last message, the other participant and the unread count, so the
+        inbox renders without touching the database per row.
+        """
+        last_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+        last_message = last_message.annotate(
+            snippet=Substr('body', 1, 80),
+            has_attachment=ExpressionWrapper(
+                Q(attachment__isnull=False) & ~Q(attachment=''), output_field=BooleanField()
+            ),
+        )
+        is_user_a = Q(user_a_id=user.pk)
+        return (
+            self.filter(memberships__user=user)
+            .select_related('item', 'archived_item')
+            # Same join as the filter: this user's own membership row
+            .annotate(last_read_message_id=F('memberships__last_read_message_id'))
+            .annotate(
+                last_message_id=Subquery(last_message.values('pk')[:1]),
+                last_message_body=Subquery(last_message.values('snippet')[:1]),
+                last_message_at=Subquery(last_message.values('timestamp')[:1]),
+                last_message_sender_id=Subquery(last_message.values('sender_id')[:1]),
+                last_message_has_attachment=Subquery(last_message.values('has_attachment')[:1]),
+                other_user_id=Case(When(is_user_a, then=F('user_b_id')), default=F('user_a_id')),
+                other_username=Case(When(is_user_a, then=F('user_b__username')), default=F('user_a__username')),
+                unread_count=unread_count(OuterRef('pk'), user, OuterRef('last_read_message_id')),
+            )
+        )
+
+    def involving(self, user):
+        """Conversations ``user`` takes part in, matched on the participant columns (no M2M join)."""
+        return self.filter(Q(user_a=user) | Q(user_b=user))
+
+    def between(self, item, user, other):
+        user_a, user_b = ordered_pair(user, other)
+        subject = 'archived_item' if isinstance(item, ArchivedItem) else 'item'
+        return self.filter(**{subject: item}, user_a=user_a, user_b=user_b)
+
+    def get_or_start(self, item, user, other):
+        """
+        The conversation about ``item`` between the two users, created with
+        both memberships when missing. The unique (item, user_a, user_b) key
+        makes this race-free: the loser of a concurrent insert hits the
+        constraint and reads the winner's row. Returns ``(conversation, created)``.
+        """
+        user_a, user_b = ordered_pair(user, other)
+        lookup = {'item': item, 'user_a': user_a, 'user_b': user_b}
+        conversation = self.filter(**lookup).first()
+        if conversation is not None:
+            return conversation, False
+        try:
+            # Insert first: on SQLite a read-then-write transaction can deadlock upgrading its lock
+            with transaction.atomic():
+                conversation = self.create(**lookup)
+                ConversationParticipant.objects.bulk_create(
+                    [ConversationParticipant(conversation=conversation, user=member) for member in (user_a, user_b)]
+                )
+        except IntegrityError:
+            return self.get(**lookup), False
+        return conversation, True
+
+def ordered_pair(user, other):
+    """Both users lowest id first, the order ``Conversation.user_a``/``user_b`` store them in."""
+    return (user, other) if user.pk < other.pk else (other, user)
+
+def unread_count(conversation, user, last_read_message_id):
+    """Incoming messages in ``conversation`` past ``user``'s read watermark, as a subquery expression."""
+    unread = (
+        Message.objects.filter(conversation=conversation, pk__gt=last_read_message_id)
+        .exclude(sender=user)
+        .order_by()
+        .values('conversation')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+
 class Conversation(models.Model):
-    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='conversations')
-    participants = models.ManyToManyField(User, related_name='conversations')
+    # Exactly one is set: the live item, or its archived copy once it moved
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, null=True, blank=True, related_name='conversations')
+    archived_item = models.ForeignKey(ArchivedItem, on_delete=models.CASCADE, null=True, blank=True, related_name='conversations')
+    participants = models.ManyToManyField(User, related_name='conversations', through='ConversationParticipant')
+    # Denormalized copy of the two participants, lower user id first, so a
+    # pair lookup is one unique-index probe and the other party is a plain FK
+    user_a = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ConversationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'user_a', 'user_b'], name='core_conversation_pair_uniq'),
+            models.CheckConstraint(condition=Q(user_a__lt=F('user_b')), name='core_conversation_pair_ordered'),
+            models.UniqueConstraint(
+                fields=['archived_item', 'user_a', 'user_b'], name='core_conversation_archived_pair_uniq'
+            ),
+            models.CheckConstraint(
+                condition=Q(item__isnull=False, archived_item__isnull=True)
+                | Q(item__isnull=True, archived_item__isnull=False),
+                name='core_conversation_one_subject',
+            ),
+        ]
 
     def __str__(self):
-        return f"COMMS_LINK // {self.item.title}"
+        return f"COMMS_LINK // {self.subject.title}"
+
+    @property
+    def subject(self):
+        """The item this thread is about, live or archived."""
+        return self.item if self.item_id is not None else self.archived_item
 
     def get_other_participant(self, user):
-        return self.participants.exclude(id=user.id).first()
+        """No query when ``user_a``/``user_b`` were loaded with ``select_related``."""
+        return self.user_b if user.pk == self.user_a_id else self.user_a
 
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     body = models.TextField(blank=True, null=True) 
     attachment = models.ImageField(upload_to='chat_images/', null=True, blank=True)
-    is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Latest-page and load-older seeks within one thread
+            models.Index(fields=['conversation', 'timestamp', 'id'], name='core_msg_conv_ts_idx'),
+        ]
+
+class ConversationParticipant(models.Model):
+    """
+    Membership row behind ``Conversation.participants``. Instead of a read
+    flag on every message, each member keeps a watermark: every message with
+    an id up to ``last_read_message_id`` counts as read for them.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'core_conversation_participants'
+        unique_together = ('conversation', 'user')
+
+    def __str__(self):
+        return f"MEMBER // @{self.user_id} IN {self.conversation_id} (READ TO {self.last_read_message_id})"
+
+    @classmethod
+    def mark_read(cls, conversation_id, user_id, message_id, previous=None):
+        """
+        Moves the user's watermark forward to ``message_id`` with one
+        compare-and-set UPDATE and takes the newly read incoming messages off
+        their unread counter. Returns how many that was. Callers that already
+        loaded the current watermark pass it as ``previous``.
+        """
+        membership = cls.objects.filter(conversation_id=conversation_id, user_id=user_id)
+        if previous is None:
+            previous = membership.values_list('last_read_message_id', flat=True).first()
+        if previous is None or previous >= message_id:
+            return 0
+        # A concurrent request that already moved the watermark owns the decrement
+        if not membership.filter(last_read_message_id=previous).update(last_read_message_id=message_id):
+            return 0
+        newly_read = (
+            Message.objects.filter(conversation_id=conversation_id, pk__gt=previous, pk__lte=message_id)
+            .exclude(sender_id=user_id)
+            .count()
+        )
+        UnreadCounter.adjust([user_id], -newly_read)
+        return newly_read
 
 # ----------------------------------------
 # 3. NOTIFICATION MODEL (SYSTEM ALERTS)
 # ----------------------------------------
 class Notification(models.Model):
+    """An alert for one user. Repeats about the same source are coalesced by ``core.notifications``."""
+    KIND_SYSTEM = 'system'
+    KIND_MESSAGE = 'message'
+    KIND_HANDSHAKE = 'handshake'
+    KIND_MATCH = 'match'
+
+    KIND_CHOICES = [
+        (KIND_SYSTEM, 'System'),
+        (KIND_MESSAGE, 'Message'),
+        (KIND_HANDSHAKE, 'Handshake'),
+        (KIND_MATCH, 'Match'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_SYSTEM)
+    # What the alert is about, e.g. 'conversation:12'; blank never coalesces
+    source = models.CharField(max_length=64, blank=True, default='')
     text = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=1)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set explicitly (not auto_now): coalescing bumps it through plain UPDATEs
+    updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(
+                fields=['user', 'kind', 'source', 'updated_at'], condition=Q(is_read=False),
+                name='core_notification_open_idx',
+            ),
+            # Unread polls (user, is_read=False) and the per-user feed by recency
+            models.Index(fields=['user', 'is_read', 'updated_at'], name='core_notification_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"ALERT // {self.text[:30]}"
 
+    @property
+    def label(self):
+        return self.text if self.count == 1 else f"{self.text} [x{self.count}]"
+
+
+class NotificationArchive(models.Model):
+    """Expired notifications moved out of the hot table by ``core.retention``; written once, never updated."""
+    id = models.BigIntegerField(primary_key=True)  # the original Notification pk
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=20)
+    source = models.CharField(max_length=64, blank=True, default='')
+    text = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"ARCHIVED ALERT // {self.text[:30]}"
+
 # ----------------------------------------
 # 4. RESOLUTION REQUEST (HANDSHAKE PROTOCOL)
 # ----------------------------------------
 class ResolutionRequest(models.Model):
+    """A claim on an item; its state changes go through ``core.handshake``."""
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='resolution_requests')
     claimant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resolution_claims')
     
@@ -162,30 +409,103 @@ class ResolutionRequest(models.Model):
             return self.claimant_confirmed
         return None
 
-    def save(self, *args, **kwargs):
-        # Auto-set item to pending if handshake begins
-        if (self.reporter_confirmed or self.claimant_confirmed) and self.item.status == Item.STATUS_ACTIVE:
-            self.item.status = Item.STATUS_PENDING
-            self.item.save()
-
-        # Finalize archive when both sign
-        if self.is_fully_confirmed():
-            item = self.item
-            if item.status != Item.STATUS_RESOLVED:
-                item.status = Item.STATUS_RESOLVED
-                item.is_active = False
-                item.is_claimed = True
-                item.claimed_by = self.claimant
-                item.resolved_at = timezone.now()
-                item.save()
-                
-                Notification.objects.create(
-                    user=item.user, 
-                    text=f"HANDSHAKE COMPLETE: {item.title.upper()} RESOLVED."
-                )
-                Notification.objects.create(
-                    user=self.claimant, 
-                    text=f"HANDSHAKE COMPLETE: {item.title.upper()} RESOLVED."
-                )
-                
-        super().save(*args, **kwargs)
\ No newline at end of file
+# ----------------------------------------
+# 5. UNREAD COUNTERS (DENORMALIZED INBOX BADGE)
+# ----------------------------------------
+class UnreadCounter(models.Model):
+    """
+    Running total of unread incoming messages per user, so the navbar badge is
+    a primary-key lookup instead of a three-table COUNT on every render.
+    Kept in step incrementally; ``reconcile_unread_counters`` rebuilds it.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"UNREAD // @{self.user.username}: {self.count}"
+
+    @classmethod
+    def get_count(cls, user):
+        return cls.objects.filter(user=user).values_list('count', flat=True).first() or 0
+
+    @classmethod
+    def adjust(cls, user_ids, delta):
+        """Adds ``delta`` (negative to subtract) to each user's counter, never dipping below zero."""
+        user_ids = list(user_ids)
+        if not user_ids or not delta:
+            return
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        cls.objects.filter(user_id__in=user_ids).update(
+            count=Greatest(F('count') + delta, 0), updated_at=timezone.now()
+        )
+
+    @classmethod
+    def reconcile(cls, batch_size=1000):
+        """Recomputes every counter from the read watermarks; returns how many users have unread mail."""
+        totals = (
+            ConversationParticipant.objects
+            .annotate(unread=unread_count(OuterRef('conversation'), OuterRef('user'), OuterRef('last_read_message_id')))
+            .filter(unread__gt=0)
+            .values_list('user')
+            .annotate(total=Sum('unread'))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                (cls(user_id=user_id, count=total) for user_id, total in totals.iterator()),
+                batch_size=batch_size,
+            )
+        return cls.objects.count()
+
+# ----------------------------------------
+# 6. MATCH ENGINE (LOST <-> FOUND CORRELATION)
+# ----------------------------------------
+class ItemMatch(models.Model):
+    """A scored LOST/FOUND pair the matcher already announced to both owners."""
+    lost_item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='found_matches')
+    found_item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='lost_matches')
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('lost_item', 'found_item')
+        ordering = ['-score']
+
+    def __str__(self):
+        return f"MATCH // {self.lost_item_id} <-> {self.found_item_id} ({self.score:.2f})"
+
+
+# ----------------------------------------
+# 7. BACKGROUND JOBS (LOCAL TASK QUEUE)
+# ----------------------------------------
+class Job(models.Model):
+    """One queued call of a ``core.tasks.task`` function; see ``run_tasks``."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='core_job_ready_idx')]
+
+    def __str__(self):
+        return f"JOB // {self.name} #{self.pk} [{self.status}]"
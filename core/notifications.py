@@ -0,0 +1,127 @@
+"""
+Notification pipeline.
+
+``send(notifications)`` takes unsaved ``Notification`` instances and writes
+them in one ``bulk_create``. Entries sharing a ``(recipient, kind, source)``
+key coalesce into a single row with a ``count``: within the batch, and into
+the recipient's still-unread row for that key if it was touched within
+``NOTIFICATION_COALESCE_WINDOW`` seconds. A burst of chat lines to someone
+who is away therefore leaves one "NEW COMMS [x30]" alert instead of thirty.
+Entries without a source never coalesce. ``bulk_create`` skips ``post_save``,
+so the live stream is fed from here, after commit.
+
+With ``NOTIFICATION_DIGEST_INTERVAL`` set, chat messages don't notify as they
+are sent. ``message_digest`` (run periodically through ``core.tasks``) turns
+everything sent since its previous run into one row per recipient and thread.
+Notification writes then follow the number of active threads, not the number
+of lines typed.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import ConversationParticipant, Message, Notification
+from .realtime import get_broker, user_channel
+
+# Messages younger than this are left for the next digest, so rows from
+# transactions still committing (ids assigned out of order) aren't skipped.
+DIGEST_SETTLE = timedelta(seconds=2)
+
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 600))
+
+
+def digest_enabled():
+    return bool(getattr(settings, 'NOTIFICATION_DIGEST_INTERVAL', 0))
+
+
+def message_notification(recipient_id, conversation_id, sender_username, count=1):
+    return Notification(
+        user_id=recipient_id, kind=Notification.KIND_MESSAGE, source=f'conversation:{conversation_id}',
+        text=f"NEW COMMS FROM @{sender_username.upper()}.", count=count,
+    )
+
+
+def send(notifications):
+    """Writes ``notifications``, coalescing repeats; returns the rows created or updated."""
+    now = timezone.now()
+    fresh, keyed = [], {}
+    for notification in notifications:
+        notification.updated_at = now
+        if not notification.source:
+            fresh.append(notification)
+            continue
+        key = (notification.user_id, notification.kind, notification.source)
+        if key in keyed:
+            keyed[key].count += notification.count
+            keyed[key].text = notification.text
+        else:
+            keyed[key] = notification
+
+    touched = []
+    if keyed:
+        open_rows = {
+            (row.user_id, row.kind, row.source): row
+            for row in Notification.objects.filter(
+                is_read=False, updated_at__gte=now - coalesce_window(),
+                user_id__in={key[0] for key in keyed}, kind__in={key[1] for key in keyed},
+                source__in={key[2] for key in keyed},
+            ).order_by('updated_at')
+        }
+        for key, notification in keyed.items():
+            row = open_rows.get(key)
+            # Conditional on is_read: a stream may deliver the row between the read and this write
+            if row is not None and Notification.objects.filter(pk=row.pk, is_read=False).update(
+                count=F('count') + notification.count, text=notification.text, updated_at=now,
+            ):
+                row.count += notification.count
+                row.text, row.updated_at = notification.text, now
+                touched.append(row)
+            else:
+                fresh.append(notification)
+
+    touched += Notification.objects.bulk_create(fresh)
+    payloads = [(user_channel(row.user_id), {'id': row.pk, 'text': row.label}) for row in touched if row.pk]
+    if payloads:
+        transaction.on_commit(lambda: _publish(payloads))
+    return touched
+
+
+def _publish(payloads):
+    broker = get_broker()
+    for channel, payload in payloads:
+        broker.publish(channel, payload)
+
+
+def message_digest(after_id):
+    """
+    Notifies recipients of every chat message past ``after_id``, one coalesced
+    row per recipient and thread, and returns the id to continue from.
+    """
+    rows = list(
+        Message.objects.filter(pk__gt=after_id, timestamp__lt=timezone.now() - DIGEST_SETTLE)
+        .values('conversation_id', 'conversation__user_a_id', 'conversation__user_b_id', 'sender_id', 'sender__username')
+        .annotate(lines=Count('pk'), last_id=Max('pk'))
+        .order_by()
+    )
+    if not rows:
+        return after_id
+    watermarks = {
+        (conversation_id, user_id): mark
+        for conversation_id, user_id, mark in ConversationParticipant.objects.filter(
+            conversation_id__in={row['conversation_id'] for row in rows}
+        ).values_list('conversation_id', 'user_id', 'last_read_message_id')
+    }
+    batch = []
+    for row in rows:
+        recipient = row['conversation__user_b_id'] if row['sender_id'] == row['conversation__user_a_id'] else row['conversation__user_a_id']
+        # Already read in the open thread: nothing to announce
+        if watermarks.get((row['conversation_id'], recipient), 0) >= row['last_id']:
+            continue
+        batch.append(message_notification(recipient, row['conversation_id'], row['sender__username'], row['lines']))
+    send(batch)
+    return max(row['last_id'] for row in rows)
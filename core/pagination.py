@@ -0,0 +1,173 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET n`` every page continues strictly after the last row of the
+previous one, so fetching page 500 costs the same index seek as page 1. The
+cursor is an opaque, URL-safe token holding the ordering values of that last row.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def row_value(row, name):
+    """``name`` off a model instance, or off a ``.values()`` dict."""
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pages through ``queryset`` by ``ordering``, a sequence of field names that
+    has to end in a unique column (``id``) so every row has a distinct position.
+    """
+
+    def __init__(self, queryset, ordering=DEFAULT_ORDERING, per_page=24):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        return self._page(list(self._window(cursor)))
+
+    async def apage(self, cursor=None):
+        return self._page([row async for row in self._window(cursor)])
+
+    def _window(self, cursor):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def _page(self, rows):
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode(rows[-1])
+        return KeysetPage(rows, next_cursor)
+
+    def encode(self, row):
+        values = [self._to_json(row_value(row, name.lstrip('-'))) for name in self.ordering]
+        payload = json.dumps(values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError) as exc:
+            raise InvalidCursor(cursor) from exc
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        try:
+            return [self._to_python(name.lstrip('-'), value) for name, value in zip(self.ordering, values)]
+        except ValidationError as exc:
+            raise InvalidCursor(cursor) from exc
+
+    def _to_json(self, value):
+        # Full isoformat on purpose: rows created within the same millisecond
+        # would otherwise collapse onto one cursor position.
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, (int, float, str)) or value is None:
+            return value
+        return str(value)
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. search_rank) round-trip through JSON as-is.
+            return value
+        return field.to_python(value)
+
+    def _after(self, values):
+        """Builds the row-value comparison ``(a, b, c) > (x, y, z)`` honouring each direction."""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for prev_name, prev_value in zip(self.ordering[:position], values[:position]):
+                step &= Q(**{prev_name.lstrip('-'): prev_value})
+            condition |= step
+        return condition
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """
+    Pages through several querysets of same-shaped models (a table and its
+    archive) as one sequence. Each is seeked with the same cursor and the
+    windows are merged in Python, so the trailing ``id`` has to be unique
+    across all of them.
+    """
+
+    def __init__(self, querysets, ordering=DEFAULT_ORDERING, per_page=24):
+        super().__init__(querysets[0], ordering, per_page)
+        self.paginators = [KeysetPaginator(queryset, ordering, per_page) for queryset in querysets]
+
+    def page(self, cursor=None):
+        rows = []
+        for paginator in self.paginators:
+            rows += paginator._window(cursor)
+        # Stable sorts, least significant key first, merge mixed directions
+        for name in reversed(self.ordering):
+            rows.sort(key=lambda row: row_value(row, name.lstrip('-')), reverse=name.startswith('-'))
+        return self._page(rows[:self.per_page + 1])
+
+
+def paginate(request, queryset, ordering=DEFAULT_ORDERING, per_page=24):
+    """
+    Reads ``?cursor=`` off the request and returns the matching page, 404ing on
+    garbage. A list of querysets is paged as one merged sequence.
+    """
+    if isinstance(queryset, (list, tuple)):
+        paginator = MergedKeysetPaginator(queryset, ordering, per_page)
+    else:
+        paginator = KeysetPaginator(queryset, ordering, per_page)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("INVALID CURSOR: SIGNAL TRACE LOST.")
+
+
+async def apaginate(request, queryset, ordering=DEFAULT_ORDERING, per_page=24):
+    """Async twin of :func:`paginate` for async views."""
+    try:
+        return await KeysetPaginator(queryset, ordering, per_page).apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("INVALID CURSOR: SIGNAL TRACE LOST.")
+
+
+def cursor_url(request, cursor):
+    """Current URL with every filter preserved and ``cursor`` swapped in."""
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
@@ -0,0 +1,102 @@
+"""
+Pub/sub fan-out for live notifications.
+
+Publishers (model signals running in sync worker threads) hand a small payload
+to the broker; every open stream subscribed to that user's channel receives it
+on its own event loop. ``InProcessBroker`` only reaches subscribers living in
+the same process, so multi-process deployments plug in a shared broker through
+``settings.NOTIFICATION_BROKER``.
+
+Held connections (the SSE stream, waiting long polls) are only offered to
+requests served over ASGI, where they wait on the event loop. Under WSGI each
+one would park a worker thread for its whole lifetime, so clients poll instead.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.module_loading import import_string
+
+
+def holds_connections(request):
+    """Whether ``request`` came in over ASGI, where an idle open connection costs no thread."""
+    return isinstance(request, ASGIRequest)
+
+
+def user_channel(user_id):
+    return f'notifications:{user_id}'
+
+
+class Subscription:
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def get(self, timeout=None):
+        """Next published payload, or ``None`` once ``timeout`` seconds pass quietly."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BaseBroker:
+    """Interface every notification broker implements."""
+
+    def publish(self, channel, payload):
+        """Delivers ``payload`` to every current subscriber of ``channel``. Safe to call from any thread."""
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Async context manager yielding a :class:`Subscription` for ``channel``."""
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self, max_backlog=100):
+        self.max_backlog = max_backlog
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, payload):
+        with self._lock:
+            targets = list(self._subscribers.get(channel, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:
+                # The subscriber's loop already shut down; its cleanup will drop it.
+                pass
+
+    @staticmethod
+    def _offer(queue, payload):
+        if queue.full():
+            # A stalled client loses its oldest payload rather than growing without bound.
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_backlog))
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        try:
+            yield Subscription(entry[1])
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(entry)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, 'NOTIFICATION_BROKER', 'core.realtime.InProcessBroker')
+    return import_string(path)()
@@ -0,0 +1,135 @@
+"""
+Primary/replica database routing.
+
+With ``settings.DATABASE_REPLICAS`` listing read-only aliases, reads go to a
+random replica and writes to ``default``. Reads stay on the primary:
+
+* for sessions and the job queue, always;
+* inside a transaction on the primary, and after the current request or
+  block has written anything, so code reads back what it just wrote;
+* inside ``use_primary()``, for code that cannot tolerate replication lag;
+* for ``REPLICA_STICKY_SECONDS`` after a request that wrote, for that browser
+  session (``ReplicaStickinessMiddleware``), so a user sees their own new item
+  or message on the next page even if the replicas are behind. The deadline
+  rides in a cookie rather than the session store, so pinning costs no query.
+
+Migrations only run on the primary; replicas are expected to be copies of it
+(``manage.py sync_sqlite_replicas`` makes them locally).
+"""
+import contextvars
+import random
+import time
+from contextlib import ContextDecorator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'primary_until'
+
+# Tables that are read right back after being written by another request or a
+# worker (sessions at login, the job queue), so a lagging copy is never good enough
+PRIMARY_ONLY = {'sessions.session', 'core.job'}
+
+_force_primary = contextvars.ContextVar('db_force_primary', default=False)
+_wrote = contextvars.ContextVar('db_wrote', default=None)
+
+
+class use_primary(ContextDecorator):
+    """Sends every read in the block (or decorated function) to the primary."""
+
+    def __enter__(self):
+        self._token = _force_primary.set(True)
+        return self
+
+    def __exit__(self, *exc_info):
+        _force_primary.reset(self._token)
+        return False
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        pool = replicas()
+        if not pool or model._meta.label_lower in PRIMARY_ONLY or _force_primary.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        wrote = _wrote.get()
+        if wrote is not None and wrote[0]:
+            return DEFAULT_DB_ALIAS
+        return random.choice(pool)
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        if wrote is not None:
+            wrote[0] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replicas()}
+        return obj1._state.db in pool and obj2._state.db in pool
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """Pins a browser to the primary for a while after any request of theirs writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        wrote, tokens = self.enter(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.exit(tokens)
+        return self.pin(response, wrote)
+
+    async def __acall__(self, request):
+        wrote, tokens = self.enter(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.exit(tokens)
+        return self.pin(response, wrote)
+
+    def enter(self, request):
+        try:
+            sticky = float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        # A one-item list so the router can flag writes made anywhere in this request
+        wrote = [False]
+        return wrote, (_wrote.set(wrote), _force_primary.set(True) if sticky else None)
+
+    def exit(self, tokens):
+        wrote_token, primary_token = tokens
+        if primary_token is not None:
+            _force_primary.reset(primary_token)
+        _wrote.reset(wrote_token)
+
+    def pin(self, response, wrote):
+        if wrote[0]:
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 15)
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + seconds:.0f}', max_age=seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,179 @@
+"""
+Full-text search backends for the discovery feed.
+
+Every backend takes an ``Item`` queryset plus the raw search string and hands
+back the same queryset narrowed to the matching rows and annotated with
+``search_rank`` (lower is more relevant), so callers can keep chaining filters
+and orderings on it like any other queryset.
+"""
+import re
+from functools import lru_cache
+from itertools import chain
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Splits a raw search string into lowercase word tokens."""
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+class BaseSearchBackend:
+    """Interface every search backend implements."""
+
+    def index(self, item):
+        """Adds or refreshes a single item in the index."""
+        raise NotImplementedError
+
+    def remove(self, item_id):
+        """Drops a single item from the index."""
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        """Returns ``queryset`` filtered to matches and annotated with ``search_rank``."""
+        raise NotImplementedError
+
+    def rebuild(self, *querysets, chunk_size=1000):
+        """Re-indexes every item in ``querysets`` (live and archived) and returns how many were indexed."""
+        raise NotImplementedError
+
+    def no_match(self, queryset):
+        # Still annotated: callers order by search_rank even when nothing can match
+        return queryset.none().annotate(search_rank=Value(0, output_field=IntegerField()))
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Portable fallback that needs no index: every token has to appear in the
+    title, location or description. Each token scores 0 for a title hit, 1
+    for a location hit and 2 for a description-only hit, and the rank is the
+    sum, so items matching more of the query in their title come first.
+    """
+
+    def index(self, item):
+        pass
+
+    def remove(self, item_id):
+        pass
+
+    def rebuild(self, *querysets, chunk_size=1000):
+        return 0
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return self.no_match(queryset)
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(title__icontains=token) | Q(location__icontains=token) | Q(description__icontains=token)
+            )
+        ranks = [
+            Case(
+                When(title__icontains=token, then=Value(0)),
+                When(location__icontains=token, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )
+            for token in tokens
+        ]
+        return queryset.annotate(search_rank=sum(ranks[1:], ranks[0]))
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    Inverted index backed by an SQLite FTS5 virtual table keyed on the item id.
+
+    Every token is matched as a prefix, and results are ranked with BM25
+    weighted title > location > description.
+    """
+    table = 'core_item_fts'
+    weights = (10.0, 5.0, 1.0)
+
+    def create_table(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            "title, location, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        weights = ', '.join(str(weight) for weight in self.weights)
+        cursor.execute(
+            f"INSERT INTO {self.table}({self.table}, rank) VALUES ('rank', %s)",
+            [f'bm25({weights})'],
+        )
+
+    def drop_table(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def build_match(self, query):
+        """Turns user input into an FTS5 expression that ANDs prefix terms."""
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def index(self, item):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [item.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table}(rowid, title, location, description) VALUES (%s, %s, %s, %s)',
+                [item.pk, item.title, item.location, item.description],
+            )
+
+    def remove(self, item_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [item_id])
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return self.no_match(queryset)
+        item_table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', (match,))
+        ).annotate(search_rank=RawSQL(
+            f'SELECT rank FROM {self.table} WHERE {self.table} MATCH %s AND rowid = {item_table}.id',
+            (match,),
+        ))
+
+    def rebuild(self, *querysets, chunk_size=1000):
+        # Live and archived items keep disjoint pks, so they share one index
+        rows = chain.from_iterable(
+            queryset.order_by().values_list('pk', 'title', 'location', 'description').iterator(chunk_size=chunk_size)
+            for queryset in querysets
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            count = self.insert_rows(cursor, rows, chunk_size)
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('optimize')")
+        return count
+
+    def insert_rows(self, cursor, rows, chunk_size=1000):
+        """Bulk-loads ``(pk, title, location, description)`` tuples in fixed-size batches."""
+        sql = f'INSERT INTO {self.table}(rowid, title, location, description) VALUES (%s, %s, %s, %s)'
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+        return count
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """
+    Resolves ``settings.SEARCH_BACKEND``. FTS5 only exists on SQLite, so any
+    other database quietly gets the portable backend instead.
+    """
+    path = getattr(settings, 'SEARCH_BACKEND', 'core.search.SQLiteFTS5Backend')
+    backend_class = import_string(path)
+    if issubclass(backend_class, SQLiteFTS5Backend) and connection.vendor != 'sqlite':
+        backend_class = DatabaseSearchBackend
+    return backend_class()
@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_generation
+from .images import has_derivatives
+from .models import ArchivedItem, ConversationParticipant, Item, Message, Notification, Profile, UnreadCounter
+from .realtime import get_broker, user_channel
+from .search import get_search_backend
+from .tasks import build_image_derivatives, match_reported_item
+
+# ----------------------------------------
+# SEARCH INDEX SYNC
+# ----------------------------------------
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index(instance)
+
+# ----------------------------------------
+# LOST <-> FOUND MATCHING
+# ----------------------------------------
+@receiver(post_save, sender=Item)
+def match_new_item(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    match_reported_item.delay(instance.pk)
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=ArchivedItem)
+def unindex_item(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+# ----------------------------------------
+# PAGE CACHE INVALIDATION
+# ----------------------------------------
+# Bumped after commit, so a page rendered mid-transaction from the old rows
+# can't be stored under the new generation.
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=ArchivedItem)
+def invalidate_item_pages(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_generation)
+
+# ----------------------------------------
+# IMAGE DERIVATIVES
+# ----------------------------------------
+# The upload is already in storage by post_save; derivatives are only queued
+# when missing, so re-saving a row with an unchanged image costs one exists().
+def queue_derivatives(field_file):
+    if field_file and field_file.name and not has_derivatives(field_file):
+        build_image_derivatives.delay(field_file.name)
+
+@receiver(post_save, sender=Item)
+def item_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_derivatives(instance.image)
+
+@receiver(post_save, sender=Profile)
+def profile_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_derivatives(instance.image)
+
+@receiver(post_save, sender=Message)
+def attachment_derivatives(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        queue_derivatives(instance.attachment)
+
+# ----------------------------------------
+# UNREAD COUNTER SYNC
+# ----------------------------------------
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    recipients = ConversationParticipant.objects.filter(
+        conversation_id=instance.conversation_id
+    ).exclude(user_id=instance.sender_id).values_list('user_id', flat=True)
+    UnreadCounter.adjust(recipients, 1)
+
+# ----------------------------------------
+# LIVE NOTIFICATION FAN-OUT
+# ----------------------------------------
+# Covers one-off Notification.objects.create(); batches written through
+# core.notifications.send() publish themselves.
+@receiver(post_save, sender=Notification)
+def broadcast_notification(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    channel = user_channel(instance.user_id)
+    payload = {'id': instance.pk, 'text': instance.label}
+    transaction.on_commit(lambda: get_broker().publish(channel, payload))
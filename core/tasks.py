@@ -0,0 +1,257 @@
+"""
+Database-backed background jobs.
+
+``@task`` turns a function into something views can ``.delay(...)``: the call
+is stored as a ``Job`` row and returns immediately, inside the caller's
+transaction, so a rolled-back request never leaves orphaned work behind.
+``manage.py run_tasks`` runs worker threads that claim due jobs with a
+conditional ``UPDATE ... WHERE status='queued'`` (safe on SQLite and across
+several runner processes), retry failures with exponential backoff and keep
+jobs that exhausted their attempts as ``failed`` for inspection. Successful
+jobs are deleted. Arguments must be JSON-serializable: pass ids, not objects.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import notifications
+from .caching import bump_generation
+from .images import generate_derivatives
+from .matching import match_item
+from .models import Item, Job, Message, Notification, Profile
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 30          # seconds before the first retry, doubled per attempt
+DEFAULT_MAX_BACKOFF = 3600
+STALE_AFTER = timedelta(minutes=10)
+STALE_SWEEP_INTERVAL = timedelta(minutes=1)   # how often each worker looks for stalled jobs
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, backoff, max_backoff):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def delay(self, *args, **kwargs):
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, countdown=0):
+        """Queues one call; with ``settings.TASKS_EAGER`` it runs inline instead (tests, scripts)."""
+        kwargs = kwargs or {}
+        if getattr(settings, 'TASKS_EAGER', False):
+            self.func(*args, **kwargs)
+            return None
+        return Job.objects.create(
+            name=self.name, args=list(args), kwargs=kwargs, max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=countdown),
+        )
+
+    def retry_delay(self, attempts):
+        """Exponential backoff with jitter, so a burst of failures does not retry in lockstep."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def task(func=None, *, name=None, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+    def register(func):
+        wrapped = Task(func, name or f'{func.__module__}.{func.__qualname__}', max_attempts, backoff, max_backoff)
+        REGISTRY[wrapped.name] = wrapped
+        return wrapped
+    return register(func) if func is not None else register
+
+
+# ----------------------------------------
+# WORKER LOOP
+# ----------------------------------------
+def claim(worker_id, limit=1):
+    """Atomically takes up to ``limit`` due jobs; losers of a race simply skip the row."""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_at__lte=now)
+        .order_by('run_at', 'pk')
+        .values_list('pk', flat=True)[:limit * 4]
+    )
+    claimed = []
+    for pk in candidates:
+        taken = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if taken:
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'pk'))
+
+
+def execute(job):
+    """Runs one claimed job, then deletes it, reschedules it or marks it failed."""
+    registered = REGISTRY.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f'No task registered as {job.name!r}.')
+        # Jobs are queued right after the write they follow up on; a lagging replica may not have it yet
+        with use_primary():
+            registered.func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        retry = registered is not None and job.attempts < job.max_attempts
+        logger.warning('Job %s (%s) failed on attempt %s/%s.', job.pk, job.name, job.attempts, job.max_attempts)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_QUEUED if retry else Job.STATUS_FAILED,
+            run_at=timezone.now() + registered.retry_delay(job.attempts) if retry else job.run_at,
+            locked_by='', locked_at=None, last_error=error,
+        )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Frees jobs whose worker died mid-run (the attempt still counts)."""
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=timezone.now() - older_than).update(
+        status=Job.STATUS_QUEUED, locked_by='', locked_at=None,
+    )
+
+
+def work(worker_id, stop, poll_interval=1.0, burst=False):
+    """Claims and runs jobs until ``stop`` is set (or, in ``burst`` mode, the queue is drained)."""
+    processed = 0
+    # run_tasks sweeps once at startup; a long-lived runner also has to catch
+    # the jobs of sibling processes that die while it keeps going
+    next_sweep = time.monotonic() + STALE_SWEEP_INTERVAL.total_seconds()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            if time.monotonic() >= next_sweep:
+                freed = requeue_stale()
+                if freed:
+                    logger.warning('Worker %s requeued %s stalled jobs.', worker_id, freed)
+                next_sweep = time.monotonic() + STALE_SWEEP_INTERVAL.total_seconds()
+            jobs = claim(worker_id)
+            if not jobs:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for job in jobs:
+                execute(job)
+                processed += 1
+    finally:
+        connection.close()
+    return processed
+
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def run_workers(count, stop=None, poll_interval=1.0, burst=False):
+    """Runs ``count`` worker threads in this process and returns how many jobs they handled."""
+    stop = stop or threading.Event()
+    results = [0] * count
+
+    def target(index):
+        results[index] = work(worker_name(index), stop, poll_interval, burst)
+
+    threads = [threading.Thread(target=target, args=(index,), daemon=True) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return sum(results)
+
+
+# ----------------------------------------
+# CORE TASKS
+# ----------------------------------------
+@task(max_attempts=3)
+def build_image_derivatives(name):
+    if not generate_derivatives(default_storage, name):
+        return
+    # Cached cards and avatars are keyed on updated_at and were rendered without
+    # the <source> elements; restamp the owners so those fragments are rebuilt
+    now = timezone.now()
+    Item.objects.filter(image=name).update(updated_at=now)
+    Profile.objects.filter(image=name).update(updated_at=now)
+    bump_generation()
+
+
+@task
+def match_reported_item(item_id):
+    item = Item.objects.filter(pk=item_id).first()
+    if item is not None:
+        match_item(item)
+
+
+@task
+def send_message_digest(after_id):
+    """One link of the digest chain: notifies, then queues the next run from the new cursor."""
+    cursor = notifications.message_digest(after_id)
+    interval = getattr(settings, 'NOTIFICATION_DIGEST_INTERVAL', 0)
+    # Eager mode would run the next link inline, forever
+    if interval and not getattr(settings, 'TASKS_EAGER', False):
+        send_message_digest.enqueue(args=(cursor,), countdown=interval)
+
+
+@task
+def send_notifications(entries):
+    """Writes notifications a request queued through ``queue_notifications``."""
+    notifications.send([Notification(**entry) for entry in entries])
+
+
+def queue_notifications(pending):
+    """
+    Hands unsaved ``Notification`` instances to a worker instead of writing
+    (and coalescing) them in the request; the job row commits or rolls back
+    with the caller's transaction.
+    """
+    entries = [
+        {'user_id': row.user_id, 'kind': row.kind, 'source': row.source, 'text': row.text, 'count': row.count}
+        for row in pending
+    ]
+    if entries:
+        send_notifications.delay(entries)
+
+
+def schedule_message_digest():
+    """Starts the digest chain when digest mode is on and no link of it is pending."""
+    if not getattr(settings, 'NOTIFICATION_DIGEST_INTERVAL', 0):
+        return None
+    links = Job.objects.filter(name=send_message_digest.name)
+    if links.exclude(status=Job.STATUS_FAILED).exists():
+        return None
+    # Resume where a chain that exhausted its retries stopped, else from now on
+    failed = links.order_by('-pk').values_list('args', flat=True).first()
+    cursor = failed[0] if failed else Message.objects.aggregate(last=Max('pk'))['last'] or 0
+    return send_message_digest.enqueue(args=(cursor,))
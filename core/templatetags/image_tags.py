@@ -0,0 +1,31 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.images import available_formats, has_derivatives, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(field_file, sizes='100vw', alt='', css_class=''):
+    """
+    ``<picture>`` offering the AVIF/WebP derivatives through ``srcset`` and
+    the untouched original as the fallback ``<img>``. The wrapper uses
+    ``display: contents`` so existing ``<img>`` sizing classes keep working.
+
+    Derivatives are built by a queued job, so until it has run only the
+    original is offered: browsers don't fall back to the ``<img>`` when a
+    ``<source>`` they picked 404s.
+    """
+    if not field_file:
+        return ''
+    sources = ''
+    if has_derivatives(field_file):
+        sources = format_html_join(
+            '', '<source type="image/{}" srcset="{}" sizes="{}">',
+            ((fmt, srcset(field_file, fmt), sizes) for fmt in available_formats()),
+        )
+    return format_html(
+        '<picture class="contents">{}<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        sources, field_file.url, alt, css_class,
+    )
@@ -1,3 +1,1143 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import math
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import ExifTags, Image
+
+from core import caching, geo, handshake, images, matching, notifications, retention, tasks, transfer, views
+from core.archive import archive_resolved
+from core.asgi import PooledASGIHandler
+from core.instrumentation import QueryBudgetExceeded, QueryBudgetTestMixin
+from core.models import (
+    ArchivedItem, Conversation, ConversationParticipant, Item, ItemMatch, Job, Message, Notification,
+    NotificationArchive, ResolutionRequest, UnreadCounter,
+)
+from core.pagination import InvalidCursor, KeysetPaginator
+from core.routers import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaStickinessMiddleware, use_primary
+from core.search import DatabaseSearchBackend, SQLiteFTS5Backend
+
+
+LONG_AGO = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_parties():
+    """The two users most tests need: an item's owner and someone who found it."""
+    return User.objects.create_user('owner', password='pw'), User.objects.create_user('finder', password='pw')
+
+
+def make_item(user, title='Wallet', **fields):
+    """An item with the required-but-irrelevant fields filled in."""
+    fields = {'description': 'Brown leather', 'location': 'Quezon City', 'date_happened': datetime.date(2026, 1, 1), **fields}
+    return Item.objects.create(title=title, user=user, **fields)
+
+
+def make_resolved_item(user, title='Wallet', resolved_at=LONG_AGO, **fields):
+    """A resolved item, by default resolved long enough ago to be archived."""
+    return make_item(user, title, status=Item.STATUS_RESOLVED, is_active=False, resolved_at=resolved_at, **fields)
+
+
+def deliver_notifications():
+    """Runs the queued notification jobs, as a worker would."""
+    for job in Job.objects.filter(name=tasks.send_notifications.name):
+        tasks.execute(job)
+
+
+@tasks.task(max_attempts=2, backoff=10)
+def flaky(fail):
+    if fail:
+        raise RuntimeError('SIGNAL LOST')
+
+
+class ViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Every page stays within its declared @query_budget, however much data there is."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.finder = make_parties()
+        for n in range(12):
+            item = make_item(cls.owner if n % 2 else cls.finder, f'Wallet {n}')
+            conversation, _ = Conversation.objects.get_or_start(item, cls.owner, cls.finder)
+            for k in range(3):
+                Message.objects.create(conversation=conversation, sender=cls.finder if k % 2 else cls.owner, body='Ping')
+            Notification.objects.create(user=cls.owner, text=f'ALERT {n}')
+            ResolutionRequest.objects.create(item=item, claimant=cls.finder if item.user == cls.owner else cls.owner)
+        cls.item, cls.conversation = item, conversation
+
+    def setUp(self):
+        self.client.login(username='owner', password='pw')
+
+    def test_pages_stay_within_budget(self):
+        urls = [
+            reverse('core:home'),
+            reverse('core:home') + '?q=wallet',
+            reverse('core:inbox'),
+            reverse('core:conversation_detail', args=[self.conversation.pk]),
+            reverse('core:conversation_since', args=[self.conversation.pk]) + '?after=0',
+            reverse('core:dashboard'),
+            reverse('core:check_notifications'),
+            reverse('core:item_detail', args=[self.item.pk]),
+            reverse('core:my_posts'),
+            reverse('core:profile'),
+            reverse('core:api_items') + '?q=wallet',
+            reverse('core:api_item_detail', args=[self.item.pk]),
+            reverse('core:api_inbox'),
+            reverse('core:api_notifications'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'core:home': 1})
+    def test_overrun_fails_the_request(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('core:home'))
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_stats_headers(self):
+        response = self.client.get(reverse('core:inbox'))
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_assert_max_queries(self):
+        with self.assertMaxQueries(1):
+            list(Item.objects.all())
+
+
+class SearchTests(TestCase):
+    """Ranked search on the feed and the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.finder = make_parties()
+        make_item(cls.owner, 'Tote bag', description='Has an umbrella inside')
+        make_item(cls.owner, 'Umbrella', description='Blue, folding')
+        make_item(cls.owner, 'Jacket', location='Umbrella stand, MRT Cubao')
+
+    def test_title_hits_rank_first(self):
+        for backend in (SQLiteFTS5Backend(), DatabaseSearchBackend()):
+            with self.subTest(backend=type(backend).__name__):
+                ranked = backend.search(Item.objects.all(), 'umbrella').order_by('search_rank', '-id')
+                self.assertEqual([item.title for item in ranked], ['Umbrella', 'Jacket', 'Tote bag'])
+
+    def test_every_word_counts_towards_rank(self):
+        make_item(self.owner, 'Blue umbrella')
+        make_item(self.owner, 'Umbrella', location='Blue Bay Walk')
+        ranked = DatabaseSearchBackend().search(Item.objects.all(), 'umbrella blue').order_by('search_rank', '-id')
+        self.assertEqual(
+            [(item.title, item.location, item.search_rank) for item in ranked],
+            [('Blue umbrella', 'Quezon City', 0), ('Umbrella', 'Blue Bay Walk', 1), ('Umbrella', 'Quezon City', 2)],
+        )
+
+    def test_query_without_words(self):
+        # Punctuation tokenizes to nothing: an empty result, not a missing search_rank
+        for query in ('!!!', '"', '-', '^'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('core:home'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['items']), [])
+                response = self.client.get(reverse('core:api_items'), {'q': query})
+                self.assertEqual(response.json()['results'], [])
+
+
+class MatchingTests(TestCase):
+    """Lost reports are paired with similar found ones from other people, and each pair is announced once."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+
+    @staticmethod
+    def row(pk, user_id, title, location='Quezon City', date=datetime.date(2026, 1, 1), item_type=Item.FOUND):
+        return {
+            'pk': pk, 'user_id': user_id, 'item_type': item_type, 'title': title, 'description': 'Brown leather',
+            'location': location, 'latitude': None, 'longitude': None, 'date_happened': date,
+        }
+
+    def test_scores_and_threshold(self):
+        query = matching.Corpus([self.row(1, 1, 'Leather wallet', item_type=Item.LOST)])
+        candidates = matching.Corpus([
+            self.row(2, 2, 'Leather wallet'),
+            self.row(3, 2, 'Folding umbrella', location='Baguio Session Road', date=datetime.date(2025, 6, 1)),
+            self.row(4, 1, 'Leather wallet'),
+        ])
+        idf = matching.inverse_document_frequency(query, candidates)
+        scores = matching.score_block(query, candidates, idf, 0, 1, 0, 3)[0]
+        self.assertGreater(scores[0], matching.MATCH_THRESHOLD)
+        self.assertLess(scores[1], matching.MATCH_THRESHOLD)
+        # The same owner's report scores -inf however alike it is
+        self.assertEqual(scores[2], float('-inf'))
+
+        self.assertEqual([(q, c) for q, c, _ in matching.top_matches(query, candidates, idf)], [(0, 0)])
+        self.assertEqual(len(matching.top_matches(query, candidates, idf, threshold=scores[1])), 2)
+        self.assertEqual(matching.top_matches(query, candidates, idf, threshold=scores[0] + 0.01), [])
+
+    def test_new_report_is_announced_once(self):
+        lost = make_item(self.owner, 'Leather wallet', item_type=Item.LOST)
+        found = make_item(self.finder, 'Leather wallet', item_type=Item.FOUND)
+        self.assertEqual(matching.match_item(found), 1)
+        self.assertEqual(list(ItemMatch.objects.values_list('lost_item', 'found_item')), [(lost.pk, found.pk)])
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', 'kind')),
+            [('finder', Notification.KIND_MATCH), ('owner', Notification.KIND_MATCH)],
+        )
+        # Scoring the pair again, from either side or in batch, announces nothing new
+        self.assertEqual(matching.match_item(lost), 0)
+        self.assertEqual(matching.rematch_all(processes=1), 0)
+        self.assertEqual(ItemMatch.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_rematch_all_pairs_lost_with_found_only(self):
+        other = User.objects.create_user('other', password='pw')
+        lost = make_item(self.owner, 'Leather wallet', item_type=Item.LOST)
+        also_lost = make_item(other, 'Leather wallet', item_type=Item.LOST)
+        found = make_item(self.finder, 'Leather wallet', item_type=Item.FOUND)
+        # The owner's own found report never pairs with their lost one
+        own_found = make_item(self.owner, 'Leather wallet', item_type=Item.FOUND)
+        self.assertEqual(matching.rematch_all(processes=1), 3)
+        self.assertEqual(
+            set(ItemMatch.objects.values_list('lost_item', 'found_item')),
+            {(lost.pk, found.pk), (also_lost.pk, found.pk), (also_lost.pk, own_found.pk)},
+        )
+
+
+class GeoTests(TestCase):
+    """Geohash cells cover the whole radius, and the near-me feed keeps only what is inside it, nearest first."""
+
+    def test_known_geohash(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, precision=11), 'u4pruydqqvj')
+        self.assertEqual(geo.encode(57.64911, 10.40744), 'u4pruydqq')
+
+    def test_cells_cover_circle_at_cell_edge(self):
+        radius = 1.0
+        height, width = geo.cell_size(5)
+        # A hair inside the south-west corner of a cell, so the circle spills into three neighbours
+        lat, lon = 14.6 // height * height + 0.0001, 121.0 // width * width + 0.0001
+        cells = geo.covering_cells(lat, lon, radius)
+        step = 0.99 * radius / geo.KM_PER_DEGREE
+        outside = 0
+        for bearing in range(0, 360, 15):
+            point_lat = lat + step * math.cos(math.radians(bearing))
+            point_lon = lon + step * math.sin(math.radians(bearing)) / math.cos(math.radians(lat))
+            code = geo.encode(point_lat, point_lon)
+            with self.subTest(bearing=bearing):
+                self.assertTrue(any(code.startswith(cell) for cell in cells))
+            outside += not code.startswith(geo.encode(lat, lon, len(cells[0])))
+        self.assertGreater(outside, 0)
+
+    def test_near_me_feed(self):
+        owner, _ = make_parties()
+        lat, lon = 14.6, 121.0
+        for km in (3, 8, 0.5):
+            make_item(owner, f'{km} km north', latitude=f'{lat + km / geo.KM_PER_DEGREE:.6f}', longitude=f'{lon:.6f}')
+        make_item(owner, 'Nowhere in particular')
+
+        response = self.client.get(reverse('core:home'), {'lat': lat, 'lon': lon, 'radius': 5})
+        items = list(response.context['items'])
+        self.assertEqual([item.title for item in items], ['0.5 km north', '3 km north'])
+        self.assertAlmostEqual(items[0].distance, 0.5, places=2)
+        self.assertContains(response, '3.0 KM')
+
+        response = self.client.get(reverse('core:home'), {'lat': lat, 'lon': lon, 'radius': 10})
+        self.assertEqual([item.title for item in response.context['items']], ['0.5 km north', '3 km north', '8 km north'])
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors continue exactly where the previous page stopped, and forged ones 404."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.finder = make_parties()
+        for n in range(7):
+            make_item(cls.owner, f'Wallet {n}')
+        # Ties on created_at must be broken by id, not skipped or repeated
+        Item.objects.filter(title__in=['Wallet 2', 'Wallet 3', 'Wallet 4']).update(created_at=LONG_AGO)
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPaginator(Item.objects.all(), per_page=3)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen += [item.pk for item in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+            self.assertEqual(paginator.decode(cursor), [page.object_list[-1].created_at, page.object_list[-1].pk])
+        self.assertEqual(seen, list(Item.objects.order_by('-created_at', '-id').values_list('pk', flat=True)))
+
+    def test_forged_cursor(self):
+        wrong_arity = base64.urlsafe_b64encode(b'[1]').decode()
+        not_a_date = base64.urlsafe_b64encode(b'["yesterday",1]').decode()
+        for cursor in ('garbage', wrong_arity, not_a_date):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    KeysetPaginator(Item.objects.all()).decode(cursor)
+                self.assertEqual(self.client.get(reverse('core:home'), {'cursor': cursor}).status_code, 404)
+
+
+class PageCacheTests(TestCase):
+    """The anonymous page cache: hits, invalidation and collapsed misses."""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.owner, self.finder = make_parties()
+        self.item = make_item(self.owner)
+
+    def hold_lock(self, url, data=None):
+        """Pretends another request is rendering ``url`` right now."""
+        params = views._home_cache_params(RequestFactory().get(url, data))
+        caching.get_cache().add(f"{caching.page_key('home', params)}:lock", 1)
+
+    def test_hits_until_items_change(self):
+        url = reverse('core:home')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        # Equivalent query strings share the entry; logged-in visitors bypass it
+        self.assertEqual(self.client.get(url, {'q': '  ', 'item_type_filter': 'all'})['X-Page-Cache'], 'HIT')
+        self.client.force_login(self.owner)
+        self.assertFalse(self.client.get(url).has_header('X-Page-Cache'))
+        self.client.logout()
+
+        self.item.title = 'Leather wallet'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Leather wallet')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+
+        # Handshake transitions are plain UPDATEs, without Item signals
+        with self.captureOnCommitCallbacks(execute=True):
+            handshake.open_claim(self.item, self.finder)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, 'Leather wallet')
+
+    def test_collapsed_miss_never_waits(self):
+        url = reverse('core:home')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        caching.bump_generation()
+        self.hold_lock(url)
+        self.hold_lock(url, {'item_type_filter': 'LOST'})
+        with mock.patch('time.sleep') as sleep:
+            # The previous generation's copy stands in while the lock holder renders...
+            response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'STALE')
+            self.assertContains(response, 'Wallet')
+            # ...and without one, the page is rendered on the spot
+            self.assertEqual(self.client.get(url, {'item_type_filter': 'LOST'})['X-Page-Cache'], 'MISS')
+        sleep.assert_not_called()
+
+
+class ConversationTests(TestCase):
+    """One thread per item and pair of users, and read watermarks that only move forward."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        self.item = make_item(self.owner)
+        self.conversation, _ = Conversation.objects.get_or_start(self.item, self.finder, self.owner)
+
+    def watermark(self):
+        return ConversationParticipant.objects.get(conversation=self.conversation, user=self.owner).last_read_message_id
+
+    def test_get_or_start_is_unique_per_pair(self):
+        # Either argument order, and the loser of an insert race, lands on the same row
+        self.assertEqual(Conversation.objects.get_or_start(self.item, self.owner, self.finder), (self.conversation, False))
+        with mock.patch('django.db.models.QuerySet.first', return_value=None):
+            self.assertEqual(Conversation.objects.get_or_start(self.item, self.finder, self.owner), (self.conversation, False))
+        self.assertEqual(Conversation.objects.count(), 1)
+        self.assertEqual(ConversationParticipant.objects.filter(conversation=self.conversation).count(), 2)
+        other, created = Conversation.objects.get_or_start(make_item(self.owner, 'Keys'), self.owner, self.finder)
+        self.assertTrue(created)
+        self.assertNotEqual(other, self.conversation)
+
+    def test_mark_read_never_moves_back(self):
+        lines = [Message.objects.create(conversation=self.conversation, sender=self.finder, body=f'Hi {k}') for k in range(5)]
+        self.assertEqual(UnreadCounter.get_count(self.owner), 5)
+        self.assertEqual(ConversationParticipant.mark_read(self.conversation.pk, self.owner.pk, lines[3].pk), 4)
+        self.assertEqual(ConversationParticipant.mark_read(self.conversation.pk, self.owner.pk, lines[1].pk), 0)
+        # A request that loaded the watermark before another one moved it loses the compare-and-set
+        self.assertEqual(
+            ConversationParticipant.mark_read(self.conversation.pk, self.owner.pk, lines[4].pk, previous=lines[0].pk), 0
+        )
+        self.assertEqual(self.watermark(), lines[3].pk)
+        self.assertEqual(UnreadCounter.get_count(self.owner), 1)
+        self.assertEqual(ConversationParticipant.mark_read(self.conversation.pk, self.owner.pk, lines[4].pk), 1)
+        self.assertEqual(self.watermark(), lines[4].pk)
+        self.assertEqual(UnreadCounter.get_count(self.owner), 0)
+
+    def post_lines(self, count):
+        return Message.objects.bulk_create(
+            Message(conversation=self.conversation, sender=self.finder, body=f'Line {k}') for k in range(count)
+        )
+
+    def test_history_pages_back_to_the_start(self):
+        lines = self.post_lines(2 * views.CHAT_PAGE_SIZE + 7)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('core:conversation_detail', args=[self.conversation.pk]))
+        seen = [message.pk for message in response.context['chat_messages']]
+        self.assertEqual(seen, [line.pk for line in lines[-views.CHAT_PAGE_SIZE:]])
+
+        url, pages = response.context['older_url'], []
+        while url:
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, 'partials/chat_older.html')
+            page = [message.pk for message in response.context['chat_messages']]
+            pages.append(len(page))
+            seen = page + seen
+            url = response.context['older_url']
+        # Each page reads oldest-first and ends right before the one already shown
+        self.assertEqual(pages, [views.CHAT_PAGE_SIZE, 7])
+        self.assertEqual(seen, [line.pk for line in lines])
+
+        stranger = User.objects.create_user('stranger', password='pw')
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(reverse('core:conversation_older', args=[self.conversation.pk])).status_code, 404)
+
+    def test_since_catches_up_in_capped_batches(self):
+        lines = self.post_lines(views.CHAT_SINCE_LIMIT + 20)
+        url = reverse('core:conversation_since', args=[self.conversation.pk])
+        self.client.force_login(self.owner)
+
+        response = self.client.get(url, {'after': 0})
+        self.assertEqual([message.pk for message in response.context['chat_messages']], [line.pk for line in lines[:views.CHAT_SINCE_LIMIT]])
+        self.assertEqual(self.watermark(), lines[views.CHAT_SINCE_LIMIT - 1].pk)
+
+        response = self.client.get(url, {'after': lines[views.CHAT_SINCE_LIMIT - 1].pk})
+        self.assertEqual([message.pk for message in response.context['chat_messages']], [line.pk for line in lines[views.CHAT_SINCE_LIMIT:]])
+        self.assertEqual(self.watermark(), lines[-1].pk)
+
+        # Nothing new: an empty 204 the poller can skip
+        response = self.client.get(url, {'after': lines[-1].pk})
+        self.assertEqual((response.status_code, response.content), (204, b''))
+        self.assertEqual(self.client.get(url, {'after': 'latest'}).status_code, 404)
+
+
+class UnreadCounterTests(TestCase):
+    """The navbar badge total follows sends and reads, and reconcile() rebuilds it from the watermarks."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        self.bystander = User.objects.create_user('bystander', password='pw')
+        self.wallet, _ = Conversation.objects.get_or_start(make_item(self.owner), self.finder, self.owner)
+        self.keys, _ = Conversation.objects.get_or_start(make_item(self.owner, 'Keys'), self.bystander, self.owner)
+
+    def counts(self):
+        return [UnreadCounter.get_count(user) for user in (self.owner, self.finder, self.bystander)]
+
+    def send(self, conversation, sender, body='Ping'):
+        self.client.force_login(sender)
+        url = reverse('core:conversation_detail', args=[conversation.pk])
+        self.assertEqual(self.client.post(url, {'body': body}, headers={'HX-Request': 'true'}).status_code, 200)
+
+    def test_send_counts_for_the_recipient_only(self):
+        self.send(self.wallet, self.finder)
+        self.send(self.wallet, self.finder)
+        self.assertEqual(self.counts(), [2, 0, 0])
+        self.send(self.wallet, self.owner)
+        self.send(self.keys, self.bystander)
+        self.assertEqual(self.counts(), [3, 1, 0])
+
+    def test_reading_a_thread_clears_only_its_lines(self):
+        for _ in range(3):
+            self.send(self.wallet, self.finder)
+        for _ in range(2):
+            self.send(self.keys, self.bystander)
+        self.assertEqual(self.counts(), [5, 0, 0])
+        self.client.force_login(self.owner)
+        self.client.get(reverse('core:conversation_detail', args=[self.wallet.pk]))
+        self.assertEqual(self.counts(), [2, 0, 0])
+        # Reading it again has nothing left to subtract
+        self.client.get(reverse('core:conversation_detail', args=[self.wallet.pk]))
+        self.assertEqual(self.counts(), [2, 0, 0])
+
+    def test_reconcile_repairs_drift(self):
+        for _ in range(3):
+            self.send(self.wallet, self.finder)
+        self.send(self.keys, self.owner)
+        UnreadCounter.objects.filter(user=self.owner).update(count=42)
+        UnreadCounter.objects.filter(user=self.bystander).delete()
+        UnreadCounter.objects.create(user=self.finder, count=7)
+        self.assertEqual(UnreadCounter.reconcile(batch_size=1), 2)
+        self.assertEqual(self.counts(), [3, 0, 1])
+        self.assertFalse(UnreadCounter.objects.filter(user=self.finder).exists())
+
+
+class NotificationTests(TestCase):
+    """Chat alerts coalesce into one row per thread instead of one per line."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        self.conversation, _ = Conversation.objects.get_or_start(make_item(self.owner), self.owner, self.finder)
+        self.client.force_login(self.finder)
+
+    def chat(self, lines, client=None, conversation=None):
+        url = reverse('core:conversation_detail', args=[(conversation or self.conversation).pk])
+        for n in range(lines):
+            (client or self.client).post(url, {'body': f'Line {n}'}, headers={'HX-Request': 'true'})
+
+    def test_burst_coalesces_into_one_row(self):
+        self.chat(4)
+        deliver_notifications()
+        alert = Notification.objects.get(user=self.owner)
+        self.assertEqual(alert.count, 4)
+        self.assertEqual(alert.label, 'NEW COMMS FROM @FINDER. [x4]')
+
+    def test_bump_skips_row_read_meanwhile(self):
+        notifications.send([notifications.message_notification(self.owner.pk, self.conversation.pk, 'finder')])
+        real_filter = Notification.objects.filter
+
+        def read_meanwhile(*args, **kwargs):
+            queryset = real_filter(*args, **kwargs)
+            if 'updated_at__gte' not in kwargs:
+                return queryset
+            # The owner's stream delivers the open row right after send() looked it up
+            rows = list(queryset)
+            real_filter(pk__in=[row.pk for row in rows]).update(is_read=True)
+            return mock.Mock(order_by=lambda *fields: rows)
+
+        with mock.patch.object(Notification.objects, 'filter', side_effect=read_meanwhile):
+            notifications.send([notifications.message_notification(self.owner.pk, self.conversation.pk, 'finder')])
+        rows = Notification.objects.filter(user=self.owner).order_by('pk')
+        self.assertEqual(list(rows.values_list('is_read', 'count')), [(True, 1), (False, 1)])
+
+    def test_wsgi_pages_poll_instead_of_streaming(self):
+        Notification.objects.create(user=self.finder, text='ALERT')
+        page = self.client.get(reverse('core:home'))
+        self.assertContains(page, f'data-poll-url="{reverse("core:check_notifications")}"')
+        self.assertNotContains(page, reverse('core:notification_stream'))
+        # Asked for a stream anyway, it answers at once instead of holding the worker
+        response = self.client.get(reverse('core:notification_stream'), headers={'Accept': 'text/event-stream'})
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+        self.assertContains(response, 'ALERT')
+
+    async def test_asgi_pages_stream(self):
+        client = AsyncClient()
+        await client.aforce_login(self.finder)
+        page = await client.get(reverse('core:home'))
+        self.assertContains(page, f'data-url="{reverse("core:notification_stream")}"')
+
+    @override_settings(NOTIFICATION_DIGEST_INTERVAL=60)
+    def test_digest_writes_one_row_per_recipient_and_thread(self):
+        other, _ = Conversation.objects.get_or_start(make_item(self.owner, 'Keys'), self.owner, self.finder)
+        owner_client = Client()
+        owner_client.force_login(self.owner)
+        self.chat(1, client=owner_client)
+        self.chat(3)
+        self.chat(2, conversation=other)
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(Job.objects.filter(name=tasks.send_notifications.name).exists())
+
+        with mock.patch('core.notifications.DIGEST_SETTLE', datetime.timedelta(0)):
+            cursor = notifications.message_digest(0)
+        self.assertEqual(cursor, Message.objects.latest('pk').pk)
+        rows = Notification.objects.values_list('user__username', 'source', 'count')
+        self.assertCountEqual(rows, [
+            ('owner', f'conversation:{self.conversation.pk}', 3),
+            ('owner', f'conversation:{other.pk}', 2),
+            ('finder', f'conversation:{self.conversation.pk}', 1),
+        ])
+
+
+@override_settings(NOTIFICATION_TTLS={'message': 7, 'handshake': 30}, NOTIFICATION_UNREAD_TTL=90)
+class NotificationRetentionTests(TestCase):
+    """purge() drops exactly the expired rows, chunk by chunk, into the chosen archive."""
+
+    def setUp(self):
+        self.owner, _ = make_parties()
+        self.now = datetime.datetime(2026, 6, 1, tzinfo=datetime.timezone.utc)
+
+        def alert(kind, days, is_read=True):
+            return Notification.objects.create(
+                user=self.owner, kind=kind, text=f'{kind} {days}', is_read=is_read,
+                updated_at=self.now - datetime.timedelta(days=days),
+            )
+
+        self.expired = [
+            alert(Notification.KIND_MESSAGE, 10),
+            alert(Notification.KIND_HANDSHAKE, 40),
+            alert(Notification.KIND_MESSAGE, 100, is_read=False),
+            alert(Notification.KIND_SYSTEM, 120),
+        ]
+        self.kept = [
+            alert(Notification.KIND_MESSAGE, 3),
+            alert(Notification.KIND_HANDSHAKE, 10),
+            alert(Notification.KIND_SYSTEM, 60),    # no TTL for its kind
+            alert(Notification.KIND_MESSAGE, 10, is_read=False),
+            alert(Notification.KIND_HANDSHAKE, 80, is_read=False),
+        ]
+
+    def assertSurvivors(self, rows):
+        self.assertCountEqual(Notification.objects.values_list('pk', flat=True), [row.pk for row in rows])
+
+    def test_ttls_per_kind_and_for_unread(self):
+        self.assertEqual(retention.purge(now=self.now), len(self.expired))
+        self.assertSurvivors(self.kept)
+
+    def test_chunks_by_batch_size(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(retention.purge(batch_size=3, now=self.now), len(self.expired))
+        deletes = [query for query in queries.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+        self.assertSurvivors(self.kept)
+
+    def test_dry_run_touches_nothing(self):
+        self.assertEqual(retention.purge(now=self.now, dry_run=True), len(self.expired))
+        self.assertSurvivors(self.expired + self.kept)
+
+    def test_table_archive_keeps_ids(self):
+        retention.purge(retention.TableArchive(), batch_size=3, now=self.now)
+        self.assertSurvivors(self.kept)
+        archived = NotificationArchive.objects.order_by('pk').values_list('pk', 'text', 'updated_at')
+        self.assertEqual(list(archived), [(row.pk, row.text, row.updated_at) for row in self.expired])
+
+
+class TaskQueueTests(TransactionTestCase):
+    """Claiming, retrying and recovering jobs (TransactionTestCase: workers close their connection)."""
+
+    def claim_one(self, worker_id='worker'):
+        jobs = tasks.claim(worker_id)
+        self.assertEqual(len(jobs), 1)
+        return jobs[0]
+
+    def test_success_deletes_the_job(self):
+        flaky.delay(False)
+        self.assertTrue(tasks.execute(self.claim_one()))
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff_then_fail(self):
+        flaky.delay(True)
+        job = self.claim_one()
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.STATUS_RUNNING, 'worker', 1))
+        self.assertEqual(tasks.claim('other'), [])
+
+        started = timezone.now()
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertFalse(tasks.execute(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.locked_at), (Job.STATUS_QUEUED, '', None))
+        self.assertIn('SIGNAL LOST', job.last_error)
+        # First retry waits 5-10 s (backoff 10, jittered down to half at most)
+        self.assertGreaterEqual(job.run_at, started + datetime.timedelta(seconds=5))
+        self.assertLessEqual(job.run_at, timezone.now() + datetime.timedelta(seconds=10))
+        self.assertEqual(tasks.claim('worker'), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=started)
+        job = self.claim_one()
+        self.assertEqual(job.attempts, 2)
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertFalse(tasks.execute(job))
+        job.refresh_from_db()
+        # Out of attempts: kept for inspection, never claimed again
+        self.assertEqual((job.status, job.run_at), (Job.STATUS_FAILED, started))
+        self.assertEqual(tasks.claim('worker'), [])
+
+    def test_requeue_stale(self):
+        stalled = flaky.delay(False)
+        running = flaky.delay(False)
+        self.claim_one('dead')
+        self.claim_one('alive')
+        Job.objects.filter(pk=stalled.pk).update(locked_at=timezone.now() - tasks.STALE_AFTER * 2)
+        self.assertEqual(tasks.requeue_stale(), 1)
+        stalled.refresh_from_db()
+        running.refresh_from_db()
+        # The interrupted attempt still counts towards max_attempts
+        self.assertEqual((stalled.status, stalled.locked_by, stalled.attempts), (Job.STATUS_QUEUED, '', 1))
+        self.assertEqual((running.status, running.locked_by), (Job.STATUS_RUNNING, 'alive'))
+
+    def test_worker_sweeps_stale_jobs(self):
+        stalled = flaky.delay(False)
+        self.claim_one('dead')
+        Job.objects.filter(pk=stalled.pk).update(locked_at=timezone.now() - tasks.STALE_AFTER * 2)
+        stop = threading.Event()
+        # Only the sweep frees the job, and the next sweep is not due for a minute
+        self.assertEqual(tasks.work('worker', stop, burst=True), 0)
+        with mock.patch('core.tasks.STALE_SWEEP_INTERVAL', datetime.timedelta(0)), self.assertLogs('core.tasks', 'WARNING'):
+            self.assertEqual(tasks.work('worker', stop, burst=True), 1)
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReadRoutingTests(TransactionTestCase):
+    """Where reads go once replicas are configured (no atomic() wrapper here, unlike TestCase)."""
+
+    REPLICAS = {'replica1', 'replica2'}
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def read_alias(self, model=Item):
+        return self.router.db_for_read(model)
+
+    def test_reads_go_to_replicas(self):
+        self.assertEqual({self.read_alias() for _ in range(50)}, self.REPLICAS)
+
+    def test_sessions_and_jobs_read_from_primary(self):
+        self.assertEqual(self.read_alias(Session), 'default')
+        self.assertEqual(self.read_alias(Job), 'default')
+
+    def test_reads_in_transaction_stay_on_primary(self):
+        with transaction.atomic():
+            self.assertEqual(self.read_alias(), 'default')
+        self.assertIn(self.read_alias(), self.REPLICAS)
+
+    def test_use_primary(self):
+        with use_primary():
+            self.assertEqual(self.read_alias(), 'default')
+        self.assertEqual(use_primary()(self.read_alias)(), 'default')
+        self.assertIn(self.read_alias(), self.REPLICAS)
+
+    def test_write_pins_request_and_browser_to_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.read_alias())
+            if request.method == 'POST':
+                self.router.db_for_write(Item)
+                seen.append(self.read_alias())
+            return HttpResponse()
+
+        middleware = ReplicaStickinessMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        self.assertIn(seen.pop(), self.REPLICAS)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        # Read-your-writes within the request...
+        response = middleware(factory.post('/'))
+        self.assertIn(seen[0], self.REPLICAS)
+        self.assertEqual(seen[1], 'default')
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertGreater(float(cookie.value), time.time())
+
+        # ...and on the browser's next request, until the deadline passes
+        seen.clear()
+        request = factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = cookie.value
+        middleware(request)
+        request = factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() - 1)
+        middleware(request)
+        self.assertEqual(seen[0], 'default')
+        self.assertIn(seen[1], self.REPLICAS)
+
+
+class HandshakeConcurrencyTests(TransactionTestCase):
+    """Both parties (and impatient double clicks) hitting the handshake at once."""
+
+    databases = '__all__'  # reads may be routed to replica aliases
+    ROUNDS = 10
+    THREADS = 6
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+
+    def race(self, *calls):
+        """Runs every call on its own thread, released together; returns results in order."""
+        barrier = threading.Barrier(len(calls))
+        results = [None] * len(calls)
+
+        def target(index, call):
+            try:
+                barrier.wait()
+                results[index] = call()
+            except Exception as exc:
+                results[index] = exc
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=target, args=pair) for pair in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def new_item(self, n):
+        return make_item(self.owner, f'Umbrella {n}')
+
+    def test_concurrent_claims_open_once(self):
+        for n in range(self.ROUNDS):
+            item = self.new_item(n)
+            results = self.race(*[lambda: handshake.open_claim(item, self.finder)] * self.THREADS)
+            self.assertEqual([r for r in results if isinstance(r, Exception)], [])
+            self.assertEqual(sum(created for _, created in results), 1)
+            self.assertEqual(len({claim.pk for claim, _ in results}), 1)
+            item.refresh_from_db()
+            self.assertEqual(item.status, Item.STATUS_PENDING)
+            deliver_notifications()
+            alerts = Notification.objects.filter(text=f'NEW HANDSHAKE REQUEST: UMBRELLA {n}.')
+            self.assertEqual(list(alerts.values_list('count', flat=True)), [1])
+
+    def test_concurrent_signatures_resolve_once(self):
+        for n in range(self.ROUNDS):
+            item = self.new_item(n)
+            claim, _ = handshake.open_claim(item, self.finder)
+
+            def click(as_claimant):
+                return lambda: handshake.sign(ResolutionRequest.objects.select_related('item').get(pk=claim.pk), as_claimant)
+
+            results = self.race(*[click(k % 2 == 0) for k in range(self.THREADS)])
+            self.assertEqual([r for r in results if isinstance(r, Exception)], [])
+            self.assertEqual(results.count(handshake.RESOLVED), 1)
+            item.refresh_from_db()
+            self.assertEqual(item.status, Item.STATUS_RESOLVED)
+            self.assertFalse(item.is_active)
+            self.assertEqual(item.claimed_by, self.finder)
+            deliver_notifications()
+            complete = Notification.objects.filter(text=f'HANDSHAKE COMPLETE: UMBRELLA {n} RESOLVED.')
+            self.assertEqual(sorted(complete.values_list('user_id', flat=True)), sorted([self.owner.pk, self.finder.pk]))
+
+    def test_sign_after_resolution_writes_nothing(self):
+        item = self.new_item(0)
+        claim, _ = handshake.open_claim(item, self.finder)
+        self.assertEqual(handshake.sign(claim, as_claimant=True), handshake.SIGNED)
+        self.assertEqual(handshake.sign(claim, as_claimant=True), handshake.ALREADY_SIGNED)
+        self.assertEqual(handshake.sign(claim, as_claimant=False), handshake.RESOLVED)
+        claim = ResolutionRequest.objects.select_related('item').get(pk=claim.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(handshake.sign(claim, as_claimant=False), handshake.ALREADY_RESOLVED)
+
+
+class ItemArchiveTests(TestCase):
+    """Long-resolved items move to the archive table and stay reachable from the feed, detail page and inbox."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        self.items = [
+            make_resolved_item(self.owner, f'Helmet {n}', resolved_at=LONG_AGO if n < 3 else None, claimed_by=self.finder)
+            for n in range(4)
+        ]
+        self.conversation, _ = Conversation.objects.get_or_start(self.items[0], self.finder, self.owner)
+        self.live = make_item(self.owner, 'Helmet live')
+        self.client.login(username='owner', password='pw')
+
+    def test_archive_and_read_back(self):
+        # The newest resolved item (no resolved_at, fresh updated_at) stays hot
+        self.assertEqual(archive_resolved(days=30, batch_size=2, dry_run=True), 3)
+        self.assertEqual(archive_resolved(days=30, batch_size=2), 3)
+        archived = [item.pk for item in self.items[:3]]
+        self.assertFalse(Item.objects.filter(pk__in=archived).exists())
+        self.assertEqual(sorted(ArchivedItem.objects.values_list('pk', flat=True)), archived)
+
+        self.conversation.refresh_from_db()
+        self.assertIsNone(self.conversation.item_id)
+        self.assertEqual(self.conversation.subject.title, 'Helmet 0')
+        self.assertContains(self.client.get(reverse('core:inbox')), 'Helmet 0')
+        self.assertContains(self.client.get(reverse('core:item_detail', args=[archived[0]])), 'Helmet 0')
+
+        # The resolved feed merges both tables, page by page, newest first
+        url = reverse('core:home') + '?status_filter=resolved'
+        with mock.patch('core.views.FEED_PAGE_SIZE', 3):
+            first = self.client.get(url)
+            second = self.client.get(first.context['next_page_url'])
+        titles = [item.title for page in (first, second) for item in page.context['items']]
+        self.assertEqual(titles, ['Helmet 3', 'Helmet 2', 'Helmet 1', 'Helmet 0'])
+        self.assertNotContains(self.client.get(reverse('core:home')), 'Helmet 0')
+        searched = self.client.get(url + '&q=helmet')
+        self.assertEqual(len(searched.context['items']), 4)
+
+    def test_owner_views_include_archive(self):
+        archive_resolved(days=30)
+        titles = ['Helmet live', 'Helmet 3', 'Helmet 2', 'Helmet 1', 'Helmet 0']
+        with mock.patch('core.views.FEED_PAGE_SIZE', 3):
+            first = self.client.get(reverse('core:my_posts'))
+            second = self.client.get(first.context['next_page_url'])
+            profile = self.client.get(reverse('core:profile'))
+        self.assertEqual([item.title for page in (first, second) for item in page.context['items']], titles)
+        self.assertEqual([item.title for item in profile.context['my_reported_items']], titles[:3])
+        self.assertEqual(profile.context['my_reported_count'], 5)
+        self.assertTrue(profile.context['more_reported_items'])
+        dashboard = self.client.get(reverse('core:dashboard'))
+        self.assertEqual([item.title for item in dashboard.context['my_reported_items']], titles)
+
+    def test_archived_item_actions(self):
+        archive_resolved(days=30)
+        archived = self.items[0].pk
+        # Visitors can reopen their thread, but not start new contact or claims
+        self.client.force_login(self.finder)
+        detail = self.client.get(reverse('core:item_detail', args=[archived]))
+        self.assertContains(detail, reverse('core:conversation_detail', args=[self.conversation.pk]))
+        self.assertNotContains(detail, reverse('core:start_conversation', args=[archived]))
+        self.assertNotContains(detail, reverse('core:claim_item', args=[archived]))
+
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('core:delete_item', args=[archived]))
+        self.assertRedirects(response, reverse('core:my_posts'))
+        self.assertFalse(ArchivedItem.objects.filter(pk=archived).exists())
+        self.assertFalse(Conversation.objects.filter(pk=self.conversation.pk).exists())
+        self.assertEqual(self.client.post(reverse('core:delete_item', args=[archived])).status_code, 404)
+
+
+class TransferTests(TestCase):
+    """export_data / import_data round trips, with fresh ids and every reference remapped."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        old = make_resolved_item(self.owner, 'Scarf')
+        item = make_item(self.owner, 'Lunchbox')
+        for subject in (old, item):
+            conversation, _ = Conversation.objects.get_or_start(subject, self.finder, self.owner)
+            for k in range(3):
+                Message.objects.create(conversation=conversation, sender=self.finder, body=f'Hi {k}')
+        ResolutionRequest.objects.create(item=item, claimant=self.finder)
+        archive_resolved(days=30)
+
+    def snapshot(self):
+        return {
+            'items': sorted(Item.objects.values_list('title', 'user__username', 'created_at')),
+            'archived': sorted(ArchivedItem.objects.values_list('title', 'created_at', 'archived_at')),
+            'threads': sorted(
+                (c.subject.title, c.user_a.username, [m.body for m in c.messages.all()]) for c in Conversation.objects.all()
+            ),
+            'claims': list(ResolutionRequest.objects.values_list('item__title', 'claimant__username')),
+        }
+
+    def test_round_trip(self):
+        before = self.snapshot()
+        for fmt, compress in (('ndjson', False), ('csv', True)):
+            with self.subTest(fmt=fmt, compress=compress), tempfile.TemporaryDirectory() as directory:
+                counts = transfer.export(directory, fmt=fmt, compress=compress, chunk_size=2)
+                self.assertEqual(counts['messages'], 6)
+                Item.objects.all().delete()
+                ArchivedItem.objects.all().delete()
+                self.finder.delete()
+                counts = transfer.load(directory, batch_size=2)
+                self.assertEqual(counts['messages'], (6, 0))
+                self.assertEqual(self.snapshot(), before)
+                self.finder = User.objects.get(username='finder')
+                self.assertFalse(self.finder.has_usable_password())
+
+
+class ImageTests(TestCase):
+    """Uploaded photos get resized derivatives, and every page that shows one offers them."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, TASKS_EAGER=True))
+        self.owner, self.finder = make_parties()
+
+    @staticmethod
+    def jpeg(size=(1600, 1200), orientation=None):
+        buffer, exif = BytesIO(), Image.Exif()
+        if orientation:
+            exif[ExifTags.Base.Make] = 'Spycam'
+            exif[ExifTags.Base.Orientation] = orientation
+        Image.new('RGB', size, 'indigo').save(buffer, format='JPEG', exif=exif.tobytes())
+        return buffer.getvalue()
+
+    def upload(self, name='photo.jpg', **options):
+        return SimpleUploadedFile(name, self.jpeg(**options), content_type='image/jpeg')
+
+    @staticmethod
+    def scan(data):
+        """The compressed image data, from the start-of-scan marker on."""
+        return data[data.index(b'\xff\xda'):]
+
+    def stored(self, name):
+        with default_storage.open(name, 'rb') as stored:
+            return stored.read()
+
+    def test_metadata_stripped_without_recompressing(self):
+        data = self.jpeg(orientation=1)
+        name = default_storage.save('item_images/photo.jpg', SimpleUploadedFile('photo.jpg', data))
+        self.assertTrue(images.generate_derivatives(default_storage, name))
+        cleaned = self.stored(name)
+        self.assertNotIn(b'Spycam', cleaned)
+        self.assertEqual(self.scan(cleaned), self.scan(data))
+        self.assertNotIn('photo.stripped.jpg', default_storage.listdir('item_images')[1])
+
+    def test_rotation_baked_in_at_source_quality(self):
+        data = self.jpeg(orientation=6)
+        name = default_storage.save('item_images/photo.jpg', SimpleUploadedFile('photo.jpg', data))
+        images.generate_derivatives(default_storage, name)
+        with Image.open(BytesIO(self.stored(name))) as cleaned, Image.open(BytesIO(data)) as source:
+            self.assertEqual(cleaned.size, (1200, 1600))
+            self.assertNotIn('exif', cleaned.info)
+            self.assertEqual(cleaned.quantization, source.quantization)
+
+    def test_failed_swap_keeps_the_original(self):
+        data = self.jpeg(orientation=1)
+        name = default_storage.save('item_images/photo.jpg', SimpleUploadedFile('photo.jpg', data))
+        with mock.patch('core.images.os.replace', side_effect=OSError), self.assertRaises(OSError):
+            images.generate_derivatives(default_storage, name)
+        self.assertEqual(self.stored(name), data)
+
+    def test_chat_attachment_offers_derivatives(self):
+        conversation, _ = Conversation.objects.get_or_start(make_item(self.owner), self.finder, self.owner)
+        message = Message.objects.create(conversation=conversation, sender=self.finder, attachment=self.upload())
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('core:conversation_detail', args=[conversation.pk]))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, f'href="{message.attachment.url}"')
+
+
+class ReadApiTests(TestCase):
+    """The v1 JSON endpoints: field selection, strong ETags and 304s that follow the data."""
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        self.item = make_item(self.owner, 'Camera', location='Makati')
+        self.conversation, _ = Conversation.objects.get_or_start(self.item, self.finder, self.owner)
+        self.message = Message.objects.create(conversation=self.conversation, sender=self.finder, body='Mine!')
+        Notification.objects.create(user=self.owner, text='ALERT')
+        self.client.login(username='owner', password='pw')
+
+    def revalidate(self, url):
+        """``(first response, status of an immediate If-None-Match retry)``."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        return response, self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code
+
+    def test_fields_and_not_modified(self):
+        response, status = self.revalidate(reverse('core:api_items') + '?fields=title,user')
+        self.assertEqual(response.json()['results'], [{'title': 'Camera', 'user': 'owner'}])
+        self.assertEqual(status, 304)
+        self.assertEqual(self.client.get(reverse('core:api_items') + '?fields=owner').status_code, 400)
+
+        detail = reverse('core:api_item_detail', args=[self.item.pk])
+        response, status = self.revalidate(detail)
+        self.assertEqual(response.json()['item']['location'], 'Makati')
+        self.assertEqual(status, 304)
+        # A 304 costs the session, the user and one aggregate: no rows are read
+        with self.assertNumQueries(3):
+            self.client.get(detail, headers={'If-None-Match': response['ETag']})
+        self.item.title = 'Film camera'
+        self.item.save()
+        self.assertEqual(self.client.get(detail, headers={'If-None-Match': response['ETag']}).status_code, 200)
+
+    def test_versions_follow_reads(self):
+        inbox = reverse('core:api_inbox')
+        response, _ = self.revalidate(inbox)
+        self.assertEqual(response.json()['results'][0]['unread'], 1)
+        ConversationParticipant.mark_read(self.conversation.pk, self.owner.pk, self.message.pk)
+        self.assertEqual(self.client.get(inbox, headers={'If-None-Match': response['ETag']}).status_code, 200)
+
+        alerts = reverse('core:api_notifications') + '?fields=text,is_read'
+        response, status = self.revalidate(alerts)
+        self.assertEqual(status, 304)
+        Notification.objects.filter(user=self.owner).update(is_read=True)
+        response = self.client.get(alerts, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.json()['results'], [{'text': 'ALERT', 'is_read': True}])
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('core:api_inbox')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('core:api_items')).status_code, 200)
+
+
+class AsyncViewConcurrencyTests(TransactionTestCase):
+    """Idle clients wait on the event loop; only actual sync work takes one of the few shared threads."""
+
+    databases = '__all__'
+    CLIENTS = 50
+    THREADS = 4
+    IDLE_SECONDS = 1
+
+    def setUp(self):
+        self.owner, self.finder = make_parties()
+        item = make_item(self.owner, 'Keys')
+        self.conversation, _ = Conversation.objects.get_or_start(item, self.finder, self.owner)
+        for k in range(5):
+            Message.objects.create(conversation=self.conversation, sender=self.finder, body=f'Ping {k}')
+        Notification.objects.bulk_create(Notification(user=self.owner, text=f'ALERT {k}') for k in range(5))
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    async def get(self, app, path, cookie):
+        """One GET straight through the ASGI application; returns ``(status, body)``."""
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        done = asyncio.Event()
+        sent_body = False
+        response = {'status': None, 'body': b''}
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            else:
+                response['body'] += message.get('body', b'')
+
+        try:
+            await app(scope, receive, send)
+        finally:
+            done.set()
+        return response['status'], response['body']
+
+    def test_idle_clients_share_a_few_threads(self):
+        idle_cookie, busy_cookie = self.session_cookie(self.finder), self.session_cookie(self.owner)
+        busy_paths = [
+            reverse('core:inbox'),
+            reverse('core:conversation_detail', args=[self.conversation.pk]),
+            reverse('core:check_notifications'),
+        ]
+        baseline = threading.active_count()
+        app = PooledASGIHandler(self.THREADS)
+
+        async def serve():
+            peak = baseline
+            requests = [self.get(app, reverse('core:notification_stream'), idle_cookie) for _ in range(self.CLIENTS)]
+            requests += [self.get(app, busy_paths[k % 3], busy_cookie) for k in range(self.CLIENTS)]
+            pending = asyncio.ensure_future(asyncio.gather(*requests))
+            while not pending.done():
+                peak = max(peak, threading.active_count())
+                await asyncio.sleep(0.005)
+            return pending.result(), peak
+
+        # Each long poll sits idle until its timeout: nobody notifies the finder
+        with mock.patch('core.views.LONG_POLL_TIMEOUT', self.IDLE_SECONDS):
+            started = time.monotonic()
+            results, peak = asyncio.run(serve())
+            elapsed = time.monotonic() - started
+
+        self.assertEqual([status for status, _ in results], [200] * (2 * self.CLIENTS))
+        self.assertIn(b'ALERT', b''.join(body for _, body in results[self.CLIENTS:]))
+        # All the idle clients waited at once (serially this would take CLIENTS seconds)...
+        self.assertLess(elapsed, self.IDLE_SECONDS * 5)
+        # ...and on no more threads than the shared pool
+        self.assertLessEqual(peak - baseline, self.THREADS)
+
+    async def test_send_through_async_view(self):
+        client = AsyncClient()
+        await client.aforce_login(self.owner)
+        url = reverse('core:conversation_detail', args=[self.conversation.pk])
+        response = await client.post(url, {'body': 'Found them'}, headers={'HX-Request': 'true'})
+        self.assertContains(response, 'Found them')
+        self.assertTrue(await Message.objects.filter(conversation=self.conversation, sender=self.owner).aexists())
+        await sync_to_async(deliver_notifications)()
+        self.assertTrue(await Notification.objects.filter(user=self.finder, text='NEW COMMS FROM @OWNER.').aexists())
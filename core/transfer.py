@@ -0,0 +1,402 @@
+"""
+Streaming bulk export and import.
+
+``export`` writes every table to its own file in a directory (``items.ndjson``,
+``messages.csv.gz`` ...), reading through ``iterator(chunk_size=...)`` so only
+one chunk of rows is ever in memory. Users are written by username, every
+other foreign key by the exported row's id. Items carry their archived copies
+too, told apart by ``archived_at``.
+
+``load`` reads the files back in dependency order and inserts them with
+batched ``bulk_create``. Rows get fresh primary keys, so references are
+translated through an ``IdMap``: old-to-new ids kept in a private on-disk
+SQLite table rather than a dict, so memory stays flat however big the dump.
+Unknown usernames become accounts with unusable passwords; rows whose parent
+isn't in the dump are skipped. Read watermarks map to the newest imported
+message at or below them, which keeps their meaning because new ids are
+handed out in old-id order.
+
+``bulk_create`` skips signals, so the search index, unread counters and page
+cache are rebuilt once at the end. Media files are not copied, only their paths.
+"""
+import csv
+import gzip
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from .archive import move
+from .caching import bump_generation
+from .models import (
+    ArchivedItem, Conversation, ConversationParticipant, Item, Message, Notification, Profile, ResolutionRequest,
+    UnreadCounter,
+)
+from .routers import use_primary
+from .search import get_search_backend
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """Lets bulk_create write back-dated auto_now/auto_now_add values."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# ----------------------------------------
+# ID MAP
+# ----------------------------------------
+class IdMap:
+    """Old -> new primary keys per table (or a value per id), in a temporary SQLite file deleted on close."""
+
+    CHUNK = 500  # stays under SQLite's bound-parameter limit
+
+    def __init__(self):
+        # An empty filename is a private on-disk database that SQLite removes itself
+        self.db = sqlite3.connect('')
+        self.db.execute('CREATE TABLE ids (tbl TEXT, old INTEGER, new INTEGER, PRIMARY KEY (tbl, old)) WITHOUT ROWID')
+
+    def add(self, table, pairs):
+        self.db.executemany('INSERT OR REPLACE INTO ids VALUES (?, ?, ?)', ((table, old, new) for old, new in pairs))
+
+    def get(self, table, olds):
+        """``{old: new}`` for whichever of ``olds`` were imported."""
+        olds = list(olds)
+        found = {}
+        for start in range(0, len(olds), self.CHUNK):
+            chunk = olds[start:start + self.CHUNK]
+            found.update(self.db.execute(
+                f"SELECT old, new FROM ids WHERE tbl = ? AND old IN ({', '.join('?' * len(chunk))})", [table, *chunk]
+            ))
+        return found
+
+    def floor(self, table, old):
+        """The new id of the highest imported row at or below ``old``, or 0."""
+        row = self.db.execute(
+            'SELECT new FROM ids WHERE tbl = ? AND old <= ? ORDER BY old DESC LIMIT 1', [table, old]
+        ).fetchone()
+        return row[0] if row else 0
+
+    def chunks(self, table, size):
+        """Every new id recorded under ``table``, ``size`` at a time."""
+        after = None
+        while True:
+            rows = self.db.execute(
+                'SELECT old, new FROM ids WHERE tbl = ? AND (? IS NULL OR old > ?) ORDER BY old LIMIT ?',
+                [table, after, after, size],
+            ).fetchall()
+            if not rows:
+                return
+            after = rows[-1][0]
+            yield [new for _, new in rows]
+
+    def close(self):
+        self.db.close()
+
+
+# ----------------------------------------
+# TABLES
+# ----------------------------------------
+class Table:
+    """
+    One exported model. Columns follow its concrete fields: user foreign keys
+    by username, other foreign keys by id (``refs`` names the table those ids
+    come from), everything else as stored.
+    """
+
+    def __init__(self, name, model, refs=None):
+        self.name = name
+        self.model = model
+        self.refs = refs or {}
+        self.fields = {}
+        self.lookups = []
+        self.users = []
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model is User:
+                column, lookup = field.name, f'{field.name}__username'
+                self.users.append(column)
+            elif field.is_relation:
+                column, lookup = field.name, field.attname
+            else:
+                column = lookup = field.attname
+            self.fields[column] = field
+            self.lookups.append(lookup)
+
+    @property
+    def columns(self):
+        return list(self.fields)
+
+    def export_rows(self, chunk_size):
+        rows = self.model.objects.order_by('pk').values_list(*self.lookups)
+        for values in rows.iterator(chunk_size=chunk_size):
+            yield dict(zip(self.fields, values))
+
+    def decode(self, row):
+        """Parses one row read back from a file (CSV gives strings, NDJSON JSON scalars)."""
+        decoded = {}
+        for column, field in self.fields.items():
+            value = row.get(column)
+            if value is None or column in self.users:
+                # CSV can't tell NULL from ''; NOT NULL text columns take ''
+                if value is None and not field.null and field.empty_strings_allowed:
+                    value = ''
+                decoded[column] = value
+            else:
+                decoded[column] = field.to_python(value)
+        return decoded
+
+    def build(self, row, users, refs, ids):
+        """An unsaved instance for ``row``, or ``None`` when a parent row is missing."""
+        values = {}
+        for column, field in self.fields.items():
+            value = row[column]
+            # New rows get fresh keys; columns of other models (archived_at) aren't stored here
+            if field.primary_key or field.model is not self.model:
+                continue
+            if column in self.users:
+                values[field.attname] = users.get(value)
+            elif column in self.refs and value is not None:
+                value = refs[column].get(value)
+                if value is None:
+                    return None
+                values[field.attname] = value
+            else:
+                values[field.attname] = value
+        return self.model(**values)
+
+    def load(self, rows, ids, batch_size):
+        """Inserts ``rows`` in batches; returns ``(loaded, skipped)``."""
+        loaded = skipped = 0
+        for batch in batches((self.decode(row) for row in rows), batch_size):
+            users = resolve_users({row[column] for row in batch for column in self.users} - {None})
+            refs = {
+                column: ids.get(target, {row[column] for row in batch} - {None})
+                for column, target in self.refs.items()
+            }
+            built = [(row, self.build(row, users, refs, ids)) for row in batch]
+            built = [(row, obj) for row, obj in built if obj is not None]
+            skipped += len(batch) - len(built)
+            with transaction.atomic():
+                self.model.objects.bulk_create([obj for _, obj in built])
+            ids.add(self.name, ((row['id'], obj.pk) for row, obj in built))
+            self.loaded(built, ids)
+            loaded += len(built)
+        return loaded, skipped
+
+    def loaded(self, built, ids):
+        """Hook run after each inserted batch."""
+
+
+class ItemTable(Table):
+    """Live and archived items in one file; archived rows come back through ``core.archive.move``."""
+
+    def __init__(self):
+        super().__init__('items', Item)
+        self.fields['archived_at'] = ArchivedItem._meta.get_field('archived_at')
+
+    def export_rows(self, chunk_size):
+        for row in super().export_rows(chunk_size):
+            yield {**row, 'archived_at': None}
+        rows = ArchivedItem.objects.order_by('pk').values_list(*self.lookups, 'archived_at')
+        for values in rows.iterator(chunk_size=chunk_size):
+            yield dict(zip(self.fields, values))
+
+    def loaded(self, built, ids):
+        # Imported as live items first so they draw ids from Item's sequence;
+        # the original archive time is kept for move() to stamp back
+        archived = [(obj.pk, row['archived_at'].isoformat()) for row, obj in built if row['archived_at'] is not None]
+        ids.add('archived', ((pk, pk) for pk, _ in archived))
+        ids.add('archived_at', archived)
+
+
+class ConversationTable(Table):
+    def __init__(self):
+        super().__init__('conversations', Conversation, refs={'item': 'items', 'archived_item': 'items'})
+
+    def build(self, row, users, refs, ids):
+        row = dict(row)
+        # Its item is live until the import re-archives it, which repoints this row
+        if row['archived_item'] is not None:
+            row['item'], row['archived_item'] = row['archived_item'], None
+            refs = {**refs, 'item': refs['archived_item']}
+        conversation = super().build(row, users, refs, ids)
+        # Remapped user ids may no longer be in pair order
+        if conversation is not None and conversation.user_a_id > conversation.user_b_id:
+            conversation.user_a_id, conversation.user_b_id = conversation.user_b_id, conversation.user_a_id
+        return conversation
+
+
+class ParticipantTable(Table):
+    def __init__(self):
+        super().__init__('participants', ConversationParticipant, refs={'conversation': 'conversations'})
+
+    def build(self, row, users, refs, ids):
+        membership = super().build(row, users, refs, ids)
+        if membership is not None and membership.last_read_message_id:
+            membership.last_read_message_id = ids.floor('messages', membership.last_read_message_id)
+        return membership
+
+
+# Dependency order: every table only refers to tables above it
+TABLES = [
+    ItemTable(),
+    ConversationTable(),
+    Table('messages', Message, refs={'conversation': 'conversations'}),
+    ParticipantTable(),
+    Table('notifications', Notification),
+    Table('claims', ResolutionRequest, refs={'item': 'items'}),
+]
+
+
+def select(names=None):
+    if not names:
+        return TABLES
+    unknown = set(names) - {table.name for table in TABLES}
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+    return [table for table in TABLES if table.name in names]
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def resolve_users(usernames):
+    """``{username: id}``, creating accounts with unusable passwords for names not seen before."""
+    found = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    missing = [User(username=name, password=make_password(None)) for name in usernames - found.keys()]
+    if missing:
+        with transaction.atomic():
+            User.objects.bulk_create(missing)
+            Profile.objects.bulk_create([Profile(user_id=user.pk) for user in missing], ignore_conflicts=True)
+        found.update((user.username, user.pk) for user in missing)
+    return found
+
+
+# ----------------------------------------
+# FILE FORMATS
+# ----------------------------------------
+def path_for(directory, table, fmt, compress):
+    return Path(directory) / f"{table.name}.{fmt}{'.gz' if compress else ''}"
+
+
+def find(directory, table):
+    """``(path, format)`` of ``table``'s file in ``directory``, or ``None``."""
+    for fmt in FORMATS:
+        for compress in (False, True):
+            path = path_for(directory, table, fmt, compress)
+            if path.exists():
+                return path, fmt
+    return None
+
+
+def open_file(path, mode):
+    if path.suffix == '.gz':
+        return gzip.open(path, f'{mode}t', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def to_text(value):
+    # Full isoformat on purpose: DjangoJSONEncoder rounds to milliseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def write_ndjson(out, columns, rows):
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row, default=to_text, separators=(',', ':')) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(out, columns, rows):
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(['' if row[column] is None else to_text(row[column]) for column in columns])
+        count += 1
+    return count
+
+
+def read_ndjson(src):
+    for line in src:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(src):
+    for row in csv.DictReader(src):
+        yield {column: None if value == '' else value for column, value in row.items()}
+
+
+WRITERS = {'ndjson': write_ndjson, 'csv': write_csv}
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+# ----------------------------------------
+# ENTRY POINTS
+# ----------------------------------------
+def export(directory, names=None, fmt='ndjson', compress=False, chunk_size=2000):
+    """Writes one file per table into ``directory``; returns ``{table: rows}``."""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for table in select(names):
+        with open_file(path_for(directory, table, fmt, compress), 'w') as out:
+            counts[table.name] = WRITERS[fmt](out, table.columns, table.export_rows(chunk_size))
+    return counts
+
+
+# Username and id lookups must see the rows this import just wrote
+@use_primary()
+def load(directory, names=None, batch_size=1000):
+    """Imports every table file found in ``directory``; returns ``{table: (loaded, skipped)}``."""
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise RuntimeError("Importing needs a database that returns primary keys from bulk inserts.")
+    counts = {}
+    ids = IdMap()
+    try:
+        with manual_timestamps(Item, Conversation, Message, Notification, ResolutionRequest):
+            for table in select(names):
+                found = find(directory, table)
+                if found is None:
+                    continue
+                path, fmt = found
+                with open_file(path, 'r') as src:
+                    counts[table.name] = table.load(READERS[fmt](src), ids, batch_size)
+        for chunk in ids.chunks('archived', batch_size):
+            stamps = {pk: datetime.fromisoformat(value) for pk, value in ids.get('archived_at', chunk).items()}
+            move(Item.objects.filter(pk__in=chunk), archived_at=stamps)
+    finally:
+        ids.close()
+    get_search_backend().rebuild(Item.objects.all(), ArchivedItem.objects.all(), chunk_size=batch_size)
+    UnreadCounter.reconcile(batch_size=batch_size)
+    bump_generation()
+    return counts
@@ -28,6 +28,8 @@ urlpatterns = [
     path('inbox/', views.inbox, name='inbox'),
     path('chat/start/<int:item_id>/', views.start_conversation, name='start_conversation'),
     path('chat/<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
+    path('chat/<int:conversation_id>/older/', views.conversation_older, name='conversation_older'),
+    path('chat/<int:conversation_id>/since/', views.conversation_since, name='conversation_since'),
 
     # -------------------------------------------------------------------------
     # 4. RESOLUTION PROTOCOL (THE HANDSHAKE)
@@ -44,7 +46,9 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'), 
     path('profile/edit/', views.edit_profile, name='edit_profile'), 
     path('notifications/check/', views.check_notifications, name='check_notifications'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('notifications/read-all/', views.mark_all_as_read, name='mark_all_as_read'),
+    path('debug/view-stats/', views.view_stats_report, name='view_stats'),
 
     # -------------------------------------------------------------------------
     # 6. AUTHENTICATION (SYSTEM ACCESS)
@@ -83,4 +87,12 @@ urlpatterns = [
              template_name='registration/password_reset_complete.html'
          ), 
          name='password_reset_complete'),
+
+    # -------------------------------------------------------------------------
+    # 8. JSON READ API (VERSIONED, CONDITIONAL GET)
+    # -------------------------------------------------------------------------
+    path('api/v1/items/', views.api_items, name='api_items'),
+    path('api/v1/items/<int:pk>/', views.api_item_detail, name='api_item_detail'),
+    path('api/v1/inbox/', views.api_inbox, name='api_inbox'),
+    path('api/v1/notifications/', views.api_notifications, name='api_notifications'),
 ]
\ No newline at end of file
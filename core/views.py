@@ -1,15 +1,20 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
-from django.db.models import Q
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_GET, require_POST
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib import messages
 from django.utils import timezone
-from django.http import HttpResponseForbidden, HttpResponse
+from django.http import Http404, HttpResponseForbidden, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.contrib.auth import get_user_model, login as auth_login
 from django.template.loader import render_to_string
 
 # Internal app imports
-from .models import Item, ResolutionRequest, Conversation, Message, Notification, Profile
+from .models import ArchivedItem, Item, ResolutionRequest, Conversation, ConversationParticipant, Message, Notification, Profile
 from .forms import (
     ItemForm, 
     ReportItemStep1Form, 
@@ -17,9 +22,36 @@ from .forms import (
     SignupForm, 
     UserProfileForm
 )
+from .search import get_search_backend
+from .geo import near
+from .pagination import InvalidCursor, KeysetPaginator, MergedKeysetPaginator, paginate, apaginate, cursor_url
+from .realtime import get_broker, holds_connections, user_channel
+from .instrumentation import query_budget, view_stats
+from .caching import cache_anonymous_page
+from .tasks import queue_notifications
+from . import api, handshake, notifications
 
 User = get_user_model()
 
+FEED_PAGE_SIZE = 24
+INBOX_PAGE_SIZE = 30
+CHAT_PAGE_SIZE = 50
+CHAT_SINCE_LIMIT = 200
+CHAT_ORDERING = ('-timestamp', '-id')
+NOTIFICATION_PAGE_SIZE = 50
+NEAR_ME_RADIUS_CHOICES = (1, 5, 10, 25, 50)
+NEAR_ME_DEFAULT_RADIUS_KM = 5
+NEAR_ME_MAX_RADIUS_KM = 50
+
+async def _request_user(request):
+    """Loads the user through the async ORM and hands it to ``request.user`` so templates don't load it again."""
+    request.user = await request.auser()
+    return request.user
+
+async def _arender(request, template_name, context):
+    # Templates and context processors touch the ORM lazily, so rendering stays on the sync thread
+    return await sync_to_async(render)(request, template_name, context)
+
 # -----------------------------------------------------------------------------
 # 1. AUTHENTICATION & IDENTITY
 # -----------------------------------------------------------------------------
@@ -43,14 +75,18 @@ def signup(request):
     return render(request, 'registration/signup.html', {'form': form})
 
 @login_required
+@query_budget(8)
 def profile(request):
     profile_obj, created = Profile.objects.get_or_create(user=request.user)
-    my_reported_items = Item.objects.filter(user=request.user).order_by('-created_at')
+    owned = _owned_items(request.user)
+    page = MergedKeysetPaginator(owned, per_page=FEED_PAGE_SIZE).page()
     
     return render(request, 'core/profile.html', {
         'user': request.user,
         'profile': profile_obj,
-        'my_reported_items': my_reported_items,
+        'my_reported_items': page.object_list,
+        'my_reported_count': owned[0].order_by().values('pk').union(owned[1].order_by().values('pk'), all=True).count(),
+        'more_reported_items': page.has_next,
     })
 
 @login_required
@@ -70,44 +106,109 @@ def edit_profile(request):
 # 2. DISCOVERY VIEWS (UPDATED FILTER LOGIC)
 # -----------------------------------------------------------------------------
 
-def home(request):
-    query = request.GET.get('q', '')
-    item_type_filter = request.GET.get('item_type_filter', 'ALL') 
+def _near_me_params(request):
+    """Returns (lat, lon, radius_km) when the request carries a valid point, else None."""
+    try:
+        lat = float(request.GET['lat'])
+        lon = float(request.GET['lon'])
+        radius = float(request.GET.get('radius', NEAR_ME_DEFAULT_RADIUS_KM))
+    except (KeyError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius < float('inf')):
+        return None
+    return lat, lon, min(radius, NEAR_ME_MAX_RADIUS_KM)
+
+def _feed_filters(request):
+    """
+    The feed's (query, item_type_filter, status_filter), normalized so that
+    equivalent query strings render, and are cached as, the same page.
+    """
+    query = ' '.join(request.GET.get('q', '').split())
+    item_type_filter = request.GET.get('item_type_filter', 'ALL').upper()
+    if item_type_filter not in ('LOST', 'FOUND'):
+        item_type_filter = 'ALL'
     status_filter = request.GET.get('status_filter', 'active') # Matches UI image_199bc7.png
-
-    # Start with all items, but select related to optimize queries
-    items = Item.objects.select_related('user', 'user__profile')
+    if status_filter == 'pending':
+        status_filter = Item.STATUS_PENDING
+    if status_filter not in (Item.STATUS_ACTIVE, Item.STATUS_PENDING, Item.STATUS_RESOLVED):
+        status_filter = 'ALL'
+    return query, item_type_filter, status_filter
+
+def _home_cache_params(request):
+    # "Near me" pages are per visitor; everything else is shared by all anonymous visitors
+    if _near_me_params(request):
+        return None
+    return (*_feed_filters(request), request.GET.get('cursor', ''), bool(request.headers.get('HX-Request')))
+
+def _owned_items(user):
+    """The user's live items and their archived ones, for views that page through both."""
+    return [Item.objects.filter(user=user), ArchivedItem.objects.filter(user=user)]
+
+def _item_feeds(query, item_type_filter, status_filter):
+    """
+    The feed's querysets (live items, plus the archive when resolved ones are
+    wanted) and their ordering, before "near me" and pagination. Shared by
+    ``home`` and the JSON API.
+    """
+    # Start with all items
+    items = Item.objects.all()
 
     # 1. HANDLE STATUS FILTER
-    if status_filter == 'active':
+    if status_filter == Item.STATUS_ACTIVE:
         # Default view: Only active signals
-        items = items.filter(status='active', is_active=True)
-    elif status_filter == 'pending':
+        items = items.filter(status=Item.STATUS_ACTIVE, is_active=True)
+    elif status_filter == Item.STATUS_PENDING:
         # Handshake in progress
-        items = items.filter(status='pending')
-    elif status_filter == 'resolved':
+        items = items.filter(status=Item.STATUS_PENDING)
+    elif status_filter == Item.STATUS_RESOLVED:
         # ARCHIVED: Only finalized items (is_active is False here)
-        items = items.filter(status='resolved')
+        items = items.filter(status=Item.STATUS_RESOLVED)
     # If status_filter == 'ALL', we show everything
+    feeds = [items]
+    if status_filter in (Item.STATUS_RESOLVED, 'ALL'):
+        # Long-resolved signals live in the archive table (see core.archive)
+        feeds.append(ArchivedItem.objects.all())
 
     # 2. HANDLE SIGNAL TYPE FILTER
     if item_type_filter != 'ALL':
-        items = items.filter(item_type=item_type_filter.lower())
+        feeds = [feed.filter(item_type=item_type_filter.lower()) for feed in feeds]
 
-    # 3. HANDLE SEARCH
+    # 3. HANDLE SEARCH (ranked by relevance through the search index)
     if query:
-        items = items.filter(
-            Q(title__icontains=query) | Q(location__icontains=query) | Q(description__icontains=query)
-        )
-        
-    items = items.order_by('-created_at')
-    
-    return render(request, 'core/home.html', {
-        'items': items, 
+        feeds = [get_search_backend().search(feed, query) for feed in feeds]
+        ordering = ('search_rank', '-created_at', '-id')
+    else:
+        ordering = ('-created_at', '-id')
+    return feeds, ordering
+
+@query_budget(6)
+@cache_anonymous_page(_home_cache_params)
+def home(request):
+    query, item_type_filter, status_filter = _feed_filters(request)
+    feeds, ordering = _item_feeds(query, item_type_filter, status_filter)
+    # Select related to optimize queries
+    feeds = [feed.select_related('user', 'user__profile') for feed in feeds]
+
+    # 4. HANDLE "NEAR ME" (geohash cell scan, then exact distance on the survivors)
+    near_me = _near_me_params(request)
+    if near_me:
+        feeds = [near(feed, *near_me) for feed in feeds]
+        ordering = ('distance', 'id')
+
+    # 5. KEYSET PAGINATION (constant cost no matter how deep the scroll goes; archive pages merge in)
+    page = paginate(request, feeds if len(feeds) > 1 else feeds[0], ordering, per_page=FEED_PAGE_SIZE)
+    context = {
+        'items': page.object_list,
+        'next_page_url': cursor_url(request, page.next_cursor) if page.has_next else None,
         'query': query, 
         'item_type_filter': item_type_filter, 
-        'status_filter': status_filter
-    })
+        'status_filter': status_filter,
+        'near_me': near_me,
+        'radius_choices': NEAR_ME_RADIUS_CHOICES,
+    }
+    if request.headers.get('HX-Request') and 'cursor' in request.GET:
+        return render(request, 'partials/item_feed.html', context)
+    return render(request, 'core/home.html', context)
 
 # -----------------------------------------------------------------------------
 # 3. ITEM MANAGEMENT
@@ -133,7 +234,7 @@ def report_item_wizard(request):
             item = Item(**wizard_data, **form.cleaned_data)
             item.user = request.user
             item.save()
-            Notification.objects.create(user=request.user, text=f"BROADCAST INITIATED: {item.title.upper()}.")
+            queue_notifications([Notification(user=request.user, text=f"BROADCAST INITIATED: {item.title.upper()}.")])
             messages.success(request, "SIGNAL BROADCASTED TO THE NETWORK.")
             return redirect('core:report_success', pk=item.pk)
     else:
@@ -146,19 +247,28 @@ def report_success(request, pk):
     return render(request, 'core/report_success.html', {'item': item})
 
 @login_required
+@query_budget(8)
 def item_detail(request, pk):
-    item = get_object_or_404(Item.objects.select_related('user', 'user__profile'), pk=pk)
+    item = Item.objects.select_related('user', 'user__profile').filter(pk=pk).first()
+    if item is None:
+        # Long-resolved signals have moved to the archive table under the same pk
+        item = get_object_or_404(ArchivedItem.objects.select_related('user', 'user__profile'), pk=pk)
     is_owner = (request.user == item.user)
-    existing_convo = Conversation.objects.filter(item=item, participants=request.user).first()
+    existing_convo = None
+    if request.user.is_authenticated and not is_owner:
+        existing_convo = Conversation.objects.between(item, request.user, item.user).first()
     
-    # Identify if there is an ongoing handshake for this item
-    active_claim = ResolutionRequest.objects.filter(item=item).filter(
-        Q(claimant=request.user) | Q(item__user=request.user)
-    ).first()
+    # Identify if there is an ongoing handshake for this item (archived ones are long settled)
+    active_claim = None
+    if isinstance(item, Item):
+        active_claim = ResolutionRequest.objects.filter(item=item).filter(
+            Q(claimant=request.user) | Q(item__user=request.user)
+        ).first()
 
     return render(request, 'core/item_detail.html', {
         'item': item, 
         'is_owner': is_owner, 
+        'is_archived': isinstance(item, ArchivedItem),
         'active_claim': active_claim, 
         'existing_conversation': existing_convo,
     })
@@ -179,7 +289,9 @@ def item_edit(request, pk):
 @login_required
 @require_POST
 def delete_item(request, pk):
-    item = get_object_or_404(Item, pk=pk, user=request.user)
+    item = Item.objects.filter(pk=pk, user=request.user).first()
+    if item is None:
+        item = get_object_or_404(ArchivedItem, pk=pk, user=request.user)
     item.delete()
     messages.warning(request, "SIGNAL PERMANENTLY DELETED.")
     return redirect('core:my_posts')
@@ -189,9 +301,18 @@ def delete_item(request, pk):
 # -----------------------------------------------------------------------------
 
 @login_required
-def inbox(request):
-    conversations = Conversation.objects.filter(participants=request.user).order_by('-updated_at')
-    return render(request, 'core/inbox.html', {'conversations': conversations})
+@query_budget(6)
+async def inbox(request):
+    user = await _request_user(request)
+    # One annotated query per page: last message, other participant and unread count included
+    page = await apaginate(request, Conversation.objects.for_inbox(user), ('-updated_at', '-id'), per_page=INBOX_PAGE_SIZE)
+    context = {
+        'conversations': page.object_list,
+        'next_page_url': cursor_url(request, page.next_cursor) if page.has_next else None,
+    }
+    if request.headers.get('HX-Request') and 'cursor' in request.GET:
+        return await _arender(request, 'partials/inbox_rows.html', context)
+    return await _arender(request, 'core/inbox.html', context)
 
 @login_required
 def start_conversation(request, item_id):
@@ -199,47 +320,101 @@ def start_conversation(request, item_id):
     if item.user == request.user:
         return redirect('core:item_detail', pk=item.id)
     
-    convo = Conversation.objects.filter(item=item, participants=request.user).first()
-    if not convo:
-        convo = Conversation.objects.create(item=item)
-        convo.participants.add(request.user, item.user)
+    convo, _ = Conversation.objects.get_or_start(item, request.user, item.user)
     return redirect('core:conversation_detail', conversation_id=convo.id)
 
+def _read_watermarks(conversation, user):
+    """``(own, other)`` read watermarks; the other member's drives the receipts on the viewer's bubbles."""
+    return _split_watermarks(dict(conversation.memberships.values_list('user_id', 'last_read_message_id')), user)
+
+async def _aread_watermarks(conversation, user):
+    rows = conversation.memberships.values_list('user_id', 'last_read_message_id')
+    return _split_watermarks({user_id: mark async for user_id, mark in rows}, user)
+
+def _split_watermarks(watermarks, user):
+    own = watermarks.pop(user.pk, None)
+    return own, max(watermarks.values(), default=0)
+
+def _chat_page(conversation, page, other_last_read):
+    # Pages are fetched newest-first along (timestamp, id); the thread reads oldest-first
+    older_url = None
+    if page.has_next:
+        older_url = f"{reverse('core:conversation_older', args=[conversation.pk])}?cursor={page.next_cursor}"
+    return {'chat_messages': page.object_list[::-1], 'older_url': older_url, 'other_last_read': other_last_read}
+
 @login_required
-def conversation_detail(request, conversation_id):
-    conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
-    other_user = conversation.get_other_participant(request.user)
+@query_budget(14)
+async def conversation_detail(request, conversation_id):
+    user = await _request_user(request)
+    conversation = await aget_object_or_404(
+        Conversation.objects.involving(user).select_related('user_a', 'user_b'), id=conversation_id
+    )
+    other_user = conversation.get_other_participant(user)
     if request.method == 'POST':
         body = request.POST.get('body')
         attachment = request.FILES.get('attachment')
         if body or attachment:
-            msg = Message.objects.create(
-                conversation=conversation, sender=request.user, body=body, attachment=attachment
+            msg = await Message.objects.acreate(
+                conversation=conversation, sender=user, body=body, attachment=attachment
             )
             conversation.updated_at = timezone.now()
-            conversation.save()
-            Notification.objects.create(user=other_user, text=f"NEW COMMS FROM @{request.user.username.upper()}.")
+            await conversation.asave()
+            # In digest mode the periodic digest announces it instead
+            if not notifications.digest_enabled():
+                await sync_to_async(queue_notifications)([
+                    notifications.message_notification(other_user.pk, conversation.pk, user.username)
+                ])
             if request.headers.get('HX-Request'):
-                return render(request, 'core/partials/message_line.html', {'message': msg})
-    
-    chat_messages = conversation.messages.all().order_by('timestamp')
-    chat_messages.exclude(sender=request.user).update(is_read=True)
-    return render(request, 'core/conversation_detail.html', {
-        'conversation': conversation, 'chat_messages': chat_messages, 'other_user': other_user,
+                return await _arender(request, 'partials/chat_messages.html', {'chat_messages': [msg], 'other_last_read': 0})
+
+    # Only the latest page; older history arrives through conversation_older on demand
+    page = await KeysetPaginator(conversation.messages.all(), CHAT_ORDERING, per_page=CHAT_PAGE_SIZE).apage()
+    own_last_read, other_last_read = await _aread_watermarks(conversation, user)
+    if page.object_list:
+        await sync_to_async(ConversationParticipant.mark_read)(
+            conversation.pk, user.pk, page.object_list[0].pk, previous=own_last_read
+        )
+    return await _arender(request, 'core/conversation_detail.html', {
+        'conversation': conversation, 'other_user': other_user, **_chat_page(conversation, page, other_last_read),
     })
 
+@login_required
+@query_budget(6)
+def conversation_older(request, conversation_id):
+    conversation = get_object_or_404(Conversation.objects.involving(request.user), id=conversation_id)
+    page = paginate(request, conversation.messages.all(), CHAT_ORDERING, per_page=CHAT_PAGE_SIZE)
+    _, other_last_read = _read_watermarks(conversation, request.user)
+    return render(request, 'partials/chat_older.html', _chat_page(conversation, page, other_last_read))
+
+@login_required
+@query_budget(12)
+def conversation_since(request, conversation_id):
+    conversation = get_object_or_404(Conversation.objects.involving(request.user), id=conversation_id)
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        raise Http404("INVALID MESSAGE MARKER.")
+    # Ids grow with time, so this seeks the (conversation_id, id) FK index directly
+    fresh = list(conversation.messages.filter(pk__gt=after).order_by('timestamp', 'id')[:CHAT_SINCE_LIMIT])
+    if not fresh:
+        return HttpResponse(status=204)
+    own_last_read, other_last_read = _read_watermarks(conversation, request.user)
+    ConversationParticipant.mark_read(conversation.pk, request.user.pk, fresh[-1].pk, previous=own_last_read)
+    return render(request, 'partials/chat_messages.html', {'chat_messages': fresh, 'other_last_read': other_last_read})
+
 # -----------------------------------------------------------------------------
 # 5. DASHBOARD & RESOLUTION (HANDSHAKE UPDATED)
 # -----------------------------------------------------------------------------
 
 @login_required
+@query_budget(8)
 def dashboard(request):
     user = request.user
     context = {
-        'notifications': Notification.objects.filter(user=user).order_by('-created_at')[:10],
-        'my_reported_items': Item.objects.filter(user=user).order_by('-created_at')[:5],
+        'notifications': Notification.objects.filter(user=user).order_by('-updated_at')[:10],
+        'my_reported_items': MergedKeysetPaginator(_owned_items(user), per_page=5).page().object_list,
         'my_claims': ResolutionRequest.objects.filter(claimant=user).select_related('item'),
-        'claims_to_review': ResolutionRequest.objects.filter(item__user=user, reporter_confirmed=False),
+        'claims_to_review': ResolutionRequest.objects.filter(item__user=user, reporter_confirmed=False).select_related('item', 'claimant'),
     }
     return render(request, 'core/dashboard.html', context)
 
@@ -251,11 +426,8 @@ def claim_item(request, item_id):
         messages.error(request, "ACCESS DENIED: CANNOT CLAIM OWN SIGNAL.")
         return redirect('core:item_detail', pk=item.id)
     
-    claim, created = ResolutionRequest.objects.get_or_create(item=item, claimant=request.user)
+    claim, created = handshake.open_claim(item, request.user)
     if created:
-        item.status = 'pending' # Update item status to pending upon claim
-        item.save()
-        Notification.objects.create(user=item.user, text=f"NEW HANDSHAKE REQUEST: {item.title.upper()}.")
         messages.success(request, "HANDSHAKE INITIATED: CLAIM SIGNAL TRANSMITTED.")
     else:
         messages.info(request, "SIGNAL ALREADY IN FLIGHT: CLAIM IS PENDING.")
@@ -264,33 +436,25 @@ def claim_item(request, item_id):
 @login_required
 @require_POST
 def confirm_resolution(request, request_id):
-    res_request = get_object_or_404(ResolutionRequest, pk=request_id)
+    res_request = get_object_or_404(ResolutionRequest.objects.select_related('item'), pk=request_id)
     item = res_request.item
     
-    is_claimant = (request.user == res_request.claimant)
-    is_owner = (request.user == item.user)
+    is_claimant = (request.user.pk == res_request.claimant_id)
+    is_owner = (request.user.pk == item.user_id)
 
     if not is_claimant and not is_owner:
         return HttpResponseForbidden("UNAUTHORIZED PROTOCOL ACCESS.")
 
-    # Apply signature based on who is clicking
-    if is_claimant:
-        res_request.claimant_confirmed = True
-        messages.info(request, "PEER SIGNATURE VERIFIED. AWAITING OWNER.")
-    elif is_owner:
-        res_request.reporter_confirmed = True
-        messages.info(request, "OWNER SIGNATURE VERIFIED. AWAITING PEER.")
-    
-    res_request.save() 
-
-    # Final Handshake Logic: Check if both confirmed
-    if res_request.claimant_confirmed and res_request.reporter_confirmed:
-        item.status = 'resolved'
-        item.is_active = False # Move to archive
-        item.resolved_at = timezone.now()
-        item.claimed_by = res_request.claimant
-        item.save()
+    # Apply signature based on who is clicking; the service settles concurrent clicks
+    outcome = handshake.sign(res_request, as_claimant=is_claimant)
+    if outcome == handshake.RESOLVED:
         messages.success(request, f"SUCCESS: {item.title.upper()} ARCHIVED IN DATABASE.")
+    elif outcome == handshake.SIGNED:
+        messages.info(request, "PEER SIGNATURE VERIFIED. AWAITING OWNER." if is_claimant else "OWNER SIGNATURE VERIFIED. AWAITING PEER.")
+    elif outcome == handshake.ALREADY_SIGNED:
+        messages.info(request, "SIGNATURE ALREADY ON FILE.")
+    else:
+        messages.error(request, "SIGNAL ALREADY ARCHIVED.")
     
     return redirect('core:item_detail', pk=item.pk)
 
@@ -299,15 +463,13 @@ def confirm_resolution(request, request_id):
 # -----------------------------------------------------------------------------
 
 @login_required
-def check_notifications(request):
-    new_logs = Notification.objects.filter(user=request.user, is_read=False)
-    if not new_logs.exists():
+@query_budget(5)
+async def check_notifications(request):
+    new_logs = await _claim_unread(await request.auser())
+    if not new_logs:
         return HttpResponse("")
-    html = ""
-    for log in new_logs:
-        html += render_to_string('partials/notification_item.html', {'message': log.text}, request=request)
-    new_logs.update(is_read=True)
-    return HttpResponse(html)
+    # Rendered without the request: context processors would re-query per row
+    return HttpResponse("".join(_render_notification(text) for _, text in new_logs))
 
 @login_required
 def mark_all_as_read(request):
@@ -315,7 +477,199 @@ def mark_all_as_read(request):
     messages.success(request, "ALL SYSTEM LOGS CLEARED.")
     return redirect('core:dashboard')
 
+@user_passes_test(lambda user: user.is_staff)
+def view_stats_report(request):
+    # Aggregates since process start (or the last ?reset=1), per URL name
+    report = view_stats.snapshot()
+    if request.GET.get('reset'):
+        view_stats.reset()
+    return JsonResponse({'views': report})
+
 @login_required
+@query_budget(6)
 def my_posts(request):
-    items = Item.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'core/my_posts.html', {'items': items})
\ No newline at end of file
+    page = paginate(request, _owned_items(request.user), per_page=FEED_PAGE_SIZE)
+    context = {
+        'items': page.object_list,
+        'next_page_url': cursor_url(request, page.next_cursor) if page.has_next else None,
+    }
+    if request.headers.get('HX-Request') and 'cursor' in request.GET:
+        return render(request, 'partials/my_posts_feed.html', context)
+    return render(request, 'core/my_posts.html', context)
+
+# -----------------------------------------------------------------------------
+# 7. LIVE NOTIFICATION STREAM (SSE WITH LONG-POLL FALLBACK)
+# -----------------------------------------------------------------------------
+
+STREAM_HEARTBEAT = 15      # seconds of silence before a keep-alive comment
+STREAM_LIFETIME = 300      # recycle streams so proxies never see them as hung
+STREAM_RETRY_MS = 3000
+LONG_POLL_TIMEOUT = 25
+
+def _render_notification(text):
+    # No request here: context processors would hit the ORM from the event loop
+    return render_to_string('partials/notification_item.html', {'message': text})
+
+def _sse_event(event_id, html):
+    data = ''.join(f"data: {line}\n" for line in html.splitlines())
+    return f"id: {event_id}\n{data}\n"
+
+async def _claim_unread(user):
+    """Takes every unread notification for ``user`` and marks it delivered."""
+    logs = [log async for log in Notification.objects.filter(user=user, is_read=False).order_by('pk')]
+    if logs:
+        await Notification.objects.filter(pk__in=[log.pk for log in logs]).aupdate(is_read=True)
+    return [(log.pk, log.label) for log in logs]
+
+async def _claim(payload):
+    """True only for the one stream that flips the row to read, so several tabs never double-toast."""
+    return await Notification.objects.filter(pk=payload['id'], is_read=False).aupdate(is_read=True) == 1
+
+async def _event_stream(user):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_LIFETIME
+    async with get_broker().subscribe(user_channel(user.pk)) as subscription:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        for pk, text in await _claim_unread(user):
+            yield _sse_event(pk, _render_notification(text))
+        while loop.time() < deadline:
+            payload = await subscription.get(timeout=STREAM_HEARTBEAT)
+            if payload is None:
+                yield ": keep-alive\n\n"
+            elif await _claim(payload):
+                yield _sse_event(payload['id'], _render_notification(payload['text']))
+
+async def _long_poll(user, timeout):
+    async with get_broker().subscribe(user_channel(user.pk)) as subscription:
+        logs = await _claim_unread(user)
+        if not logs and timeout:
+            payload = await subscription.get(timeout=timeout)
+            if payload is not None and await _claim(payload):
+                logs = [(payload['id'], payload['text'])]
+    return HttpResponse(''.join(_render_notification(text) for _, text in logs))
+
+@login_required
+async def notification_stream(request):
+    user = await request.auser()
+    if not holds_connections(request):
+        # Under WSGI the wait would pin a worker thread: answer with whatever is unread now
+        return await _long_poll(user, timeout=0)
+    if 'text/event-stream' not in request.headers.get('Accept', ''):
+        return await _long_poll(user, timeout=LONG_POLL_TIMEOUT)
+    response = StreamingHttpResponse(_event_stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# -----------------------------------------------------------------------------
+# 8. JSON READ API (V1)
+# -----------------------------------------------------------------------------
+# Rows come straight from .values(); every ETag costs one aggregate query and
+# a matching If-None-Match is answered 304 before any page is fetched.
+ITEM_API = api.Resource({
+    'id': 'id', 'title': 'title', 'description': 'description', 'item_type': 'item_type',
+    'location': 'location', 'latitude': 'latitude', 'longitude': 'longitude', 'date_happened': 'date_happened',
+    'image': 'image', 'status': 'status', 'user': 'user__username', 'is_claimed': 'is_claimed',
+    'claimed_by': 'claimed_by__username', 'resolved_at': 'resolved_at',
+    'created_at': 'created_at', 'updated_at': 'updated_at',
+}, transforms={'image': api.media_url})
+
+INBOX_API = api.Resource({
+    'id': 'id', 'subject': 'subject', 'other_user': 'other_username', 'last_message': 'last_message_body',
+    'last_message_at': 'last_message_at', 'unread': 'unread_count', 'updated_at': 'updated_at',
+})
+
+NOTIFICATION_API = api.Resource({
+    'id': 'id', 'kind': 'kind', 'text': 'text', 'count': 'count', 'is_read': 'is_read',
+    'created_at': 'created_at', 'updated_at': 'updated_at',
+})
+
+def _api_etag(versions):
+    """ETag function over ``versions(request, ...)``; none when there is nothing to version."""
+    def etag_func(request, *args, **kwargs):
+        found = versions(request, *args, **kwargs)
+        return api.etag(request, *found) if found else None
+    return etag_func
+
+def _api_list(request, resource, querysets, ordering, per_page):
+    try:
+        fields = resource.select(request)
+        page = api.page(request, [resource.values(qs, fields, ordering) for qs in querysets], ordering, per_page)
+    except api.InvalidFields as exc:
+        return api.error(str(exc))
+    except InvalidCursor:
+        return api.error("INVALID CURSOR: SIGNAL TRACE LOST.")
+    return api.respond({
+        'results': [resource.encode(row, fields) for row in page],
+        'next': cursor_url(request, page.next_cursor) if page.has_next else None,
+    })
+
+def _api_feed_versions(request):
+    feeds, _ = _item_feeds(*_feed_filters(request))
+    return [api.version(feed) for feed in feeds]
+
+def _api_item_versions(request, pk):
+    # Live first, then the archive table the item may have moved to
+    for model in (Item, ArchivedItem):
+        found = api.version(model.objects.filter(pk=pk))
+        if dict(found)['rows']:
+            return [found]
+    return None
+
+def _api_inbox_base(user):
+    return Conversation.objects.filter(memberships__user=user)
+
+def _api_inbox_versions(request):
+    # Reading moves the watermark without touching updated_at
+    return [api.version(_api_inbox_base(request.user), read=Sum('memberships__last_read_message_id'))]
+
+def _api_notifications(request):
+    rows = Notification.objects.filter(user=request.user)
+    if request.GET.get('unread'):
+        rows = rows.filter(is_read=False)
+    return rows
+
+def _api_notification_versions(request):
+    # Marking read is a plain UPDATE of is_read, so the unread count is part of the version
+    return [api.version(_api_notifications(request), unread=Count('pk', filter=Q(is_read=False)))]
+
+@query_budget(6)
+@require_GET
+@api.conditional(_api_etag(_api_feed_versions))
+def api_items(request):
+    """The discovery feed: ``?q=``, ``item_type_filter``, ``status_filter`` and ``cursor`` as on the home page."""
+    feeds, ordering = _item_feeds(*_feed_filters(request))
+    return _api_list(request, ITEM_API, feeds, ordering, FEED_PAGE_SIZE)
+
+@api.login_required
+@query_budget(6)
+@require_GET
+@api.conditional(_api_etag(_api_item_versions))
+def api_item_detail(request, pk):
+    try:
+        fields = ITEM_API.select(request)
+    except api.InvalidFields as exc:
+        return api.error(str(exc))
+    for model in (Item, ArchivedItem):
+        row = ITEM_API.values(model.objects.filter(pk=pk), fields).first()
+        if row is not None:
+            return api.respond({'item': ITEM_API.encode(row, fields)})
+    return api.error("SIGNAL NOT FOUND.", status=404)
+
+@api.login_required
+@query_budget(5)
+@require_GET
+@api.conditional(_api_etag(_api_inbox_versions))
+def api_inbox(request):
+    conversations = Conversation.objects.for_inbox(request.user).annotate(
+        subject=Coalesce('item__title', 'archived_item__title')
+    )
+    return _api_list(request, INBOX_API, [conversations], ('-updated_at', '-id'), INBOX_PAGE_SIZE)
+
+@api.login_required
+@query_budget(5)
+@require_GET
+@api.conditional(_api_etag(_api_notification_versions))
+def api_notifications(request):
+    """The viewer's alerts, newest first (``?unread=1`` for unread only); reading them here marks nothing."""
+    return _api_list(request, NOTIFICATION_API, [_api_notifications(request)], ('-updated_at', '-id'), NOTIFICATION_PAGE_SIZE)
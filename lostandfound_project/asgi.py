@@ -3,14 +3,24 @@ ASGI config for lostandfound_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this entry point (uvicorn/daphne) in production: the
+live notification stream at ``core:notification_stream`` is an async view that
+holds one long-lived connection per open tab, which only scales under ASGI. The
+chat, inbox and notification polling views are async as well. ``core.asgi``
+runs all sync work on ASGI_SYNC_THREADS shared threads, not one per request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+from core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lostandfound_project.settings')
+# DJANGO_ENV=production selects the production profile unless a module is set explicitly
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', (
+    'lostandfound_project.settings_production' if os.getenv('DJANGO_ENV') == 'production'
+    else 'lostandfound_project.settings'
+))
 
 application = get_asgi_application()
@@ -49,8 +49,10 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # --------------------------------------------------
 MIDDLEWARE = [
+    'core.instrumentation.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.routers.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -79,6 +81,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media', # Essential for accessing profile images in templates
                 'core.context_processors.unread_messages_count',
+                'core.context_processors.live_notifications',
             ],
         },
     },
@@ -91,9 +94,120 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than in-memory, so threaded concurrency tests share one database
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# --------------------------------------------------
+# READ REPLICAS
+# --------------------------------------------------
+# SQLITE_REPLICAS lists comma-separated database files served as read
+# replicas (aliases replica1, replica2, ...). Reads are spread over them and
+# writes go to default; a session that just wrote reads from default for
+# REPLICA_STICKY_SECONDS. Locally, `manage.py sync_sqlite_replicas` copies
+# default into the replica files. Tests mirror the replicas onto default.
+DATABASE_REPLICAS = []
+for index, path in enumerate(filter(None, os.getenv('SQLITE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '15'))
+
+# --------------------------------------------------
+# SEARCH ENGINE
+# --------------------------------------------------
+# Swap for 'core.search.DatabaseSearchBackend' (or any subclass of
+# core.search.BaseSearchBackend) on databases without FTS5.
+SEARCH_BACKEND = 'core.search.SQLiteFTS5Backend'
+
+# --------------------------------------------------
+# LIVE NOTIFICATIONS
+# --------------------------------------------------
+# In-process fan-out only reaches streams served by the same process. Point
+# this at a shared core.realtime.BaseBroker subclass when running several.
+NOTIFICATION_BROKER = 'core.realtime.InProcessBroker'
+
+# Repeat alerts about the same thing coalesce into the recipient's unread row
+# if it was touched within this many seconds (see core.notifications). A
+# non-zero NOTIFICATION_DIGEST_INTERVAL stops per-message chat alerts; a
+# digest job run by `manage.py run_tasks` sends them that often instead.
+NOTIFICATION_COALESCE_WINDOW = int(os.getenv('NOTIFICATION_COALESCE_WINDOW', '600'))
+NOTIFICATION_DIGEST_INTERVAL = int(os.getenv('NOTIFICATION_DIGEST_INTERVAL', '0'))
+
+# Days a read notification of each kind is kept; `manage.py purge_notifications`
+# (run it daily) archives and deletes older ones. Kinds left out are kept
+# forever. Unread alerts go after NOTIFICATION_UNREAD_TTL days (None = never).
+NOTIFICATION_TTLS = {
+    'message': 14,
+    'match': 30,
+    'handshake': 90,
+    'system': 30,
+}
+NOTIFICATION_UNREAD_TTL = 180
+
+# Resolved items move to the ArchivedItem table this many days after they were
+# closed; `manage.py archive_resolved_items` (run it daily) does the moving.
+ITEM_ARCHIVE_AFTER_DAYS = 90
+
+# Threads shared by all requests for sync work (ORM calls, templates) under
+# ASGI; idle long polls and chat tabs don't hold one (see core.asgi).
+ASGI_SYNC_THREADS = int(os.getenv('ASGI_SYNC_THREADS', '4'))
+
+# --------------------------------------------------
+# BACKGROUND JOBS
+# --------------------------------------------------
+# Side effects queued with core.tasks are run by `manage.py run_tasks`.
+# Set TASKS_EAGER to run them inline instead (no runner needed).
+TASKS_EAGER = os.getenv('TASKS_EAGER', '') == '1'
+
+# --------------------------------------------------
+# QUERY INSTRUMENTATION
+# --------------------------------------------------
+# Per-request SQL/template stats ride along as X-DB-* / Server-Timing headers
+# while this is on. Budgets declared with core.instrumentation.query_budget can
+# be overridden here by URL name (e.g. {'core:home': 12}); overruns are logged,
+# or raised when QUERY_BUDGET_ENFORCE is set (the test suite does).
+QUERY_STATS_HEADERS = DEBUG
+QUERY_BUDGETS = {}
+QUERY_BUDGET_ENFORCE = False
+
+# --------------------------------------------------
+# CACHING
+# --------------------------------------------------
+# CACHE_BACKEND picks 'locmem' (per process, the default), 'file' (shared by
+# every process on the host) or the dotted path of any Django cache backend
+# (e.g. django.core.cache.backends.redis.RedisCache) with CACHE_LOCATION.
+# Anonymous feed pages are cached for PAGE_CACHE_TIMEOUT seconds at most;
+# saving or deleting any item invalidates them sooner.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache') if CACHE_BACKEND == 'file' else 'found-it')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': CACHE_LOCATION,
+    },
+    # {% cache %} fragments (item cards, avatars) live apart, so they can be
+    # cleared without dropping cached pages
+    'template_fragments': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': {
+            'locmem': 'found-it-fragments', 'file': str(BASE_DIR / '.cache' / 'fragments'),
+        }.get(CACHE_BACKEND, CACHE_LOCATION),
+        'KEY_PREFIX': 'fragments',
+    },
+}
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '60'))
+
 # --------------------------------------------------
 # PASSWORD VALIDATION
 # --------------------------------------------------
@@ -0,0 +1,109 @@
+"""
+Production settings profile.
+
+Selected with DJANGO_ENV=production (see wsgi.py / asgi.py) or explicitly
+through DJANGO_SETTINGS_MODULE=lostandfound_project.settings_production.
+Everything not overridden here comes from settings.py.
+"""
+
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, TEMPLATES
+
+# --------------------------------------------------
+# SECURITY SETTINGS
+# --------------------------------------------------
+DEBUG = False
+SECRET_KEY = os.getenv('SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured("SECRET_KEY must be set in the environment for the production profile.")
+ALLOWED_HOSTS = [host.strip() for host in os.getenv('ALLOWED_HOSTS', '127.0.0.1,localhost').split(',') if host.strip()]
+CSRF_TRUSTED_ORIGINS = [origin for origin in os.getenv('CSRF_TRUSTED_ORIGINS', '').split(',') if origin]
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = os.getenv('SECURE_COOKIES', '1') == '1'
+
+# --------------------------------------------------
+# TEMPLATES
+# --------------------------------------------------
+# Parse each template once per process. (Django already picks this loader
+# when none are configured; spelling it out keeps it on if DEBUG flips.)
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# --------------------------------------------------
+# DATABASE
+# --------------------------------------------------
+# Connections are kept open between requests (CONN_MAX_AGE) and pinged
+# before reuse (CONN_HEALTH_CHECKS), instead of reconnecting every request.
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', '600'))
+
+# SQLite in WAL mode lets readers proceed while a writer commits. The pragmas
+# run on every new connection:
+#   synchronous=NORMAL  fsync at checkpoints only (safe under WAL)
+#   mmap_size           read pages through a 256 MB memory map
+#   cache_size          64 MB page cache per connection (negative = KiB)
+#   busy_timeout        wait up to 5 s for a lock instead of failing at once
+#   temp_store=MEMORY   sorts and temp indexes stay off disk
+# IMMEDIATE transactions take the write lock up front, so two read-then-write
+# transactions can't deadlock upgrading their locks.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-64000;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
+if os.getenv('POSTGRES_DB'):
+    # Optional Postgres: needs psycopg installed (pip install "psycopg[binary]")
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER', ''),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    # FTS5 is SQLite-only
+    SEARCH_BACKEND = 'core.search.DatabaseSearchBackend'
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': SQLITE_PRAGMAS,
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 5,
+            },
+        }
+    }
+
+# Read replicas share the primary's options: POSTGRES_REPLICA_HOSTS lists
+# replica hosts (same credentials), SQLITE_REPLICAS replica files.
+DATABASE_REPLICAS = []
+_replica_key, _replica_env = ('HOST', 'POSTGRES_REPLICA_HOSTS') if os.getenv('POSTGRES_DB') else ('NAME', 'SQLITE_REPLICAS')
+for index, source in enumerate(filter(None, os.getenv(_replica_env, '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], _replica_key: source.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+# --------------------------------------------------
+# QUERY INSTRUMENTATION
+# --------------------------------------------------
+QUERY_STATS_HEADERS = False
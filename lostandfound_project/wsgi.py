@@ -11,6 +11,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lostandfound_project.settings')
+# DJANGO_ENV=production selects the production profile unless a module is set explicitly
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', (
+    'lostandfound_project.settings_production' if os.getenv('DJANGO_ENV') == 'production'
+    else 'lostandfound_project.settings'
+))
 
 application = get_wsgi_application()